@@ -10,7 +10,7 @@ from pathlib import Path
 
 # Ajouter le dossier racine au path pour charger les utilitaires partagés.
 sys.path.append(str(Path(__file__).parent))
-from utils.data_loader import load_cities_data, format_int_fr
+from utils.data_loader import load_cities_data, get_weather_current_all, format_int_fr
 from utils.navbar import inject_navbar_css, render_navbar
 from utils.style import COLOR_SEQUENCE, COLOR_MEDIUM
 
@@ -93,26 +93,57 @@ if 'lat' in df_filtered.columns and 'lon' in df_filtered.columns:
         df_filtered = df_filtered.copy()
         df_filtered['population_fr'] = df_filtered['population'].apply(format_int_fr)
 
-    # Cartographier les villes éligibles selon leur position et leur population.
-    fig = px.scatter_mapbox(
-        df_filtered,
-        lat='lat',
-        lon='lon',
-        hover_name='ville' if 'ville' in df_filtered.columns else None,
-        hover_data={
+    show_weather = st.toggle(
+        "🌡️ Température actuelle",
+        help="Colorer les villes selon la température actuelle (Open-Meteo)"
+    )
+
+    # Couche météo : une seule table pour tout le catalogue, chargée en quelques requêtes groupées.
+    df_map = df_filtered
+    if show_weather:
+        with st.spinner("☁️ Chargement de la météo des villes..."):
+            weather = get_weather_current_all()
+        if weather['temperature'].notna().any():
+            df_map = df_filtered.merge(
+                weather[['ville', 'temperature', 'conditions']], on='ville', how='left'
+            )
+        else:
+            st.warning("⚠️ Météo actuelle non disponible, carte affichée par population")
+            show_weather = False
+
+    hover_data = None
+    if 'population' in df_map.columns:
+        hover_data = {
             'population': False,
             'population_fr': True,
             'lat': ':.4f',
             'lon': ':.4f'
-        } if 'population' in df_filtered.columns else None,
-        size='population' if 'population' in df_filtered.columns else None,
-        color='population' if 'population' in df_filtered.columns else None,
-        color_continuous_scale=COLOR_SEQUENCE,
-        range_color=[0, 500000],
+        }
+        if show_weather:
+            hover_data.update({'temperature': ':.1f', 'conditions': True})
+
+    if show_weather:
+        color_options = dict(color='temperature', color_continuous_scale='RdBu_r', labels={'temperature': '°C'})
+    else:
+        color_options = dict(
+            color='population' if 'population' in df_map.columns else None,
+            color_continuous_scale=COLOR_SEQUENCE,
+            range_color=[0, 500000]
+        )
+
+    # Cartographier les villes éligibles selon leur position et leur population.
+    fig = px.scatter_mapbox(
+        df_map,
+        lat='lat',
+        lon='lon',
+        hover_name='ville' if 'ville' in df_map.columns else None,
+        hover_data=hover_data,
+        size='population' if 'population' in df_map.columns else None,
         size_max=35,
         zoom=4.8,
         center={'lat': 46.603354, 'lon': 1.888334},
         height=600,
+        **color_options
     )
 
     fig.update_layout(
@@ -0,0 +1,207 @@
+"""
+Benchmark des indicateurs INSEE pour une liste de villes (export, classement).
+
+Compare les appels ville par ville (get_employment_data, get_housing_data, get_formation_data,
+cache du résolveur vidé) aux variantes par lot (get_*_data_many) sur un catalogue et des fichiers
+IRIS synthétiques, et vérifie que les résultats sont identiques. Le catalogue contient Paris
+(agrégation des arrondissements) et des noms écrits autrement que le libellé INSEE (recherche approchée).
+
+Usage : python benchmarks/bench_batch_indicators.py [--cities 300] [--communes-per-dept 40] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils import disk_cache
+from utils import data_loader
+
+IRIS_PER_COMMUNE = 3
+# Une ville sur FUZZY_NAME_EVERY est nommée autrement que son libellé INSEE (« Commune-01-3 »)
+FUZZY_NAME_EVERY = 10
+
+
+def _communes(communes_per_dept: int):
+    """Communes synthétiques (code, libellé, département), dont les arrondissements de Paris."""
+    communes = [(f"751{i:02d}", f"Paris {i}e Arrondissement", "75") for i in range(1, 21)]
+    for dept_number in range(1, 96):
+        dept = f"{dept_number:02d}"
+        if dept == "75":
+            continue
+        for i in range(communes_per_dept):
+            communes.append((f"{dept}{i:03d}", f"Commune {dept}-{i}", dept))
+    return communes
+
+
+def _write_iris_csv(path: Path, label_columns, numeric_columns, code_row, rows) -> None:
+    with open(path, "w", encoding="utf-8-sig") as f:
+        f.write("Recensement 2022\nIRIS\n\n")
+        f.write(";".join(label_columns + numeric_columns) + "\n")
+        f.write(";".join(code_row) + "\n")
+        for row in rows:
+            f.write(";".join(row) + "\n")
+
+
+def generate_sources(tmp: Path, communes_per_dept: int) -> list:
+    """
+    Génère emploi.csv et logement.csv (plusieurs IRIS par commune)
+    et retourne la liste des communes
+    """
+    rng = random.Random(42)
+    communes = _communes(communes_per_dept)
+
+    def _values(count: int):
+        return [f"{rng.uniform(0, 3000):.4f}".replace('.', ',') for _ in range(count)]
+
+    emploi_numeric = data_loader.EMPLOI_NUMERIC_COLUMNS
+    _write_iris_csv(
+        tmp / "emploi.csv",
+        data_loader.EMPLOI_LABEL_COLUMNS, emploi_numeric,
+        ['CODGEO', 'LIBGEO', 'DEP', 'REG'] + [f"P22_E{i}" for i in range(len(emploi_numeric))],
+        (
+            [code, label, dept, "11"] + _values(len(emploi_numeric))
+            for code, label, dept in communes for _ in range(IRIS_PER_COMMUNE)
+        )
+    )
+    logement_numeric = data_loader.LOGEMENT_NUMERIC_COLUMNS
+    _write_iris_csv(
+        tmp / "logement.csv",
+        data_loader.LOGEMENT_LABEL_COLUMNS, logement_numeric,
+        ['IRIS', 'COM', 'LIBCOM', 'DEP'] + [f"P22_L{i}" for i in range(len(logement_numeric))],
+        (
+            [f"{code}{iris:04d}", code, label, dept] + _values(len(logement_numeric))
+            for code, label, dept in communes for iris in range(IRIS_PER_COMMUNE)
+        )
+    )
+    return communes
+
+
+def write_catalogue(communes: list, cities: int) -> pd.DataFrame:
+    """
+    Écrit l'instantané du catalogue des villes (Paris + communes tirées au hasard,
+    dont une partie sous un nom qui ne se résout que par la recherche approchée)
+    """
+    rng = random.Random(7)
+    chosen = [c for c in communes if not c[0].startswith("751")]
+    chosen = rng.sample(chosen, min(cities - 1, len(chosen)))
+    records = [("Paris", "75")] + [
+        (label.replace(" ", "-") if i % FUZZY_NAME_EVERY == 0 else label, dept)
+        for i, (_, label, dept) in enumerate(chosen)
+    ]
+    df = pd.DataFrame({
+        'ville': [f"{name} ({dept})" for name, dept in records],
+        'ville_nom': [name for name, _ in records],
+        'departement_code': [dept for _, dept in records],
+        'region_code': "11",
+        'pays': "FR",
+        'timezone': "Europe/Paris",
+        'population': 50000,
+        'lat': 46.0,
+        'lon': 2.0,
+        'altitude': 100.0,
+    })
+    data_loader._write_cities_snapshot(df, {}, datetime.now(timezone.utc).isoformat())
+    return df
+
+
+def run_per_city(df_cities: pd.DataFrame):
+    data_loader._resolve_commune_version.cache_clear()
+    employment, housing, formation = {}, {}, {}
+    for city, ville_nom, departement_code in zip(
+        df_cities['ville'], df_cities['ville_nom'], df_cities['departement_code']
+    ):
+        employment[city] = data_loader.get_employment_data(city, ville_nom, departement_code)
+        housing[city] = data_loader.get_housing_data(city, ville_nom, departement_code)
+        formation[city] = _flatten_formation(data_loader.get_formation_data(city, ville_nom, departement_code))
+    return employment, housing, formation
+
+
+def run_batch(df_cities: pd.DataFrame):
+    cities = df_cities['ville'].tolist()
+    return (
+        data_loader.get_employment_data_many(cities),
+        data_loader.get_housing_data_many(cities),
+        data_loader.get_formation_data_many(cities),
+    )
+
+
+def _flatten_formation(result):
+    """Listes de get_formation_data mises à plat en clés '<clé>:<libellé>', comme get_formation_data_many."""
+    if result is None:
+        return None
+    flat = {key: value for key, value in result.items() if not isinstance(value, list)}
+    for key, labels in [
+        ('actifs_by_dipl', result['dipl_labels']),
+        ('chomeurs_by_dipl', result['dipl_labels']),
+        ('taux_chomage_by_dipl', result['dipl_labels']),
+        ('pcs_values', result['pcs_labels']),
+        ('pcs_pct', result['pcs_labels']),
+    ]:
+        flat.update({f"{key}:{label}": value for label, value in zip(labels, result[key])})
+    return flat
+
+
+def _same(per_city: dict, batch: pd.DataFrame) -> bool:
+    found = {city: result for city, result in per_city.items() if result is not None}
+    if sorted(found) != sorted(batch.index):
+        return False
+    for city, result in found.items():
+        row = batch.loc[city]
+        for key, value in result.items():
+            other = 'N/A' if row[key] is pd.NA else row[key]
+            if not (value == other or (pd.isna(value) and pd.isna(other))):
+                return False
+    return True
+
+
+def _best_of(fn, df_cities: pd.DataFrame, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df_cities)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--communes-per-dept", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Isoler les caches, les sources et le catalogue de ceux de l'application.
+        disk_cache.CACHE_DIR = tmp / "cache"
+        data_loader.EMPLOI_FILE = tmp / "emploi.csv"
+        data_loader.LOGEMENT_FILE = tmp / "logement.csv"
+        data_loader._schedule_cities_revalidation = lambda: None
+
+        communes = generate_sources(tmp, args.communes_per_dept)
+        df_cities = write_catalogue(communes, args.cities)
+
+        # Chargement des tables et de la correspondance, commun aux deux chemins.
+        data_loader.get_employment_data_many(df_cities['ville'].tolist()[:1])
+        data_loader.get_housing_data_many(df_cities['ville'].tolist()[:1])
+        fuzzy = len(data_loader.get_commune_match_report())
+
+        per_city_time, per_city = _best_of(run_per_city, df_cities, args.repeat)
+        batch_time, batch = _best_of(run_batch, df_cities, args.repeat)
+        same = all(_same(results, many) for results, many in zip(per_city, batch))
+
+    print(f"Catalogue : {len(df_cities)} villes, {len(communes)} communes INSEE")
+    print(f"Villes résolues par recherche approchée (emploi et logement) : {fuzzy}")
+    print(f"Ville par ville : {per_city_time * 1000:.0f} ms")
+    print(f"Par lot : {batch_time * 1000:.0f} ms  (x{per_city_time / batch_time:.1f})")
+    print(f"Résultats identiques : {'oui' if same else 'NON'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark du chargement des CSV INSEE : lecture + conversion numérique.
+
+Compare l'ancien chemin (essais successifs de séparateur/encodage, toutes les colonnes
+en texte puis trois passes de nettoyage par colonne) au chemin actuel (format détecté
+sur un échantillon, projection des colonnes, conversion à la lecture et secours
+vectorisé pour les seules colonnes non typées).
+
+Usage : python benchmarks/bench_insee_load.py [--rows 50000] [--extra-columns 150] [--repeat 3]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils import disk_cache
+from utils import data_loader
+
+
+def _legacy_read_insee_csv(file_path: Path, required_columns):
+    """Copie de l'ancienne lecture par essais successifs."""
+    read_attempts = [
+        {"sep": ";", "encoding": "utf-8-sig"},
+        {"sep": ";", "encoding": "latin-1"},
+        {"sep": ",", "encoding": "utf-8-sig"},
+        {"sep": ",", "encoding": "latin-1"},
+        {"sep": None, "encoding": "utf-8-sig", "engine": "python"},
+    ]
+    for skiprows in (0, 4):
+        for options in read_attempts:
+            try:
+                df = pd.read_csv(file_path, skiprows=skiprows, **options)
+                if df.empty:
+                    continue
+                df = df.rename(columns={c: str(c).strip() for c in df.columns})
+                if all(col in df.columns for col in required_columns):
+                    return df
+            except Exception:
+                continue
+    return pd.DataFrame()
+
+
+def _legacy_to_numeric_safe(series: pd.Series) -> pd.Series:
+    """Copie de l'ancienne conversion en trois passes."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    cleaned = (
+        series.astype(str)
+        .str.replace('\u202f', '', regex=False)
+        .str.replace(' ', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .replace({'': None, 'nan': None, 'None': None})
+    )
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def _format_fr(value: float, thousands: str) -> str:
+    return f"{value:,.6f}".replace(',', '#').replace('.', ',').replace('#', thousands)
+
+
+def generate_emploi_csv(path: Path, rows: int, extra_columns: int) -> None:
+    """
+    Génère un export IRIS synthétique : lignes de titre, en-tête de libellés,
+    ligne de codes, nombres au format français (espaces et espaces fines insécables).
+    """
+    rng = random.Random(42)
+    labels = data_loader.EMPLOI_LABEL_COLUMNS
+    numeric = data_loader.EMPLOI_NUMERIC_COLUMNS
+    extra = [f"Variable complémentaire {i} en 2022 (princ)" for i in range(extra_columns)]
+    codes = ['CODGEO', 'LIBGEO', 'DEP', 'REG'] + [f"P22_V{i}" for i in range(len(numeric) + extra_columns)]
+
+    with open(path, "w", encoding="utf-8-sig") as f:
+        f.write("Base Activité des résidents\nRecensement 2022\nIRIS\n\n")
+        f.write(";".join(labels + numeric + extra) + "\n")
+        f.write(";".join(codes) + "\n")
+        for i in range(rows):
+            dept = f"{i % 95 + 1:02d}"
+            commune = f"{dept}{i // 10 % 1000:03d}"
+            values = [
+                _format_fr(rng.uniform(0, 5000), '\u202f' if j % 3 == 0 else ' ')
+                for j in range(len(numeric) + extra_columns)
+            ]
+            f.write(";".join([commune, f"Commune {commune}", dept, "75"] + values) + "\n")
+
+
+def run_legacy(path: Path) -> pd.DataFrame:
+    df = _legacy_read_insee_csv(path, ['Code géographique'])
+    df = df[df['Code géographique'].astype(str) != 'CODGEO']
+    for col in data_loader.EMPLOI_NUMERIC_COLUMNS:
+        df[col] = _legacy_to_numeric_safe(df[col])
+    return df
+
+
+def run_current(path: Path) -> pd.DataFrame:
+    df = data_loader._read_insee_csv(
+        path,
+        required_columns=['Code géographique'],
+        label_columns=data_loader.EMPLOI_LABEL_COLUMNS,
+        numeric_columns=data_loader.EMPLOI_NUMERIC_COLUMNS
+    )
+    for col in data_loader.EMPLOI_NUMERIC_COLUMNS:
+        df[col] = data_loader._to_numeric_safe(df[col])
+    return df
+
+
+def _best_of(fn, path: Path, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--extra-columns", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Isoler le manifeste de formats du cache de l'application.
+        disk_cache.CACHE_DIR = Path(tmp) / "cache"
+        path = Path(tmp) / "emploi.csv"
+        generate_emploi_csv(path, args.rows, args.extra_columns)
+        size_mb = path.stat().st_size / 1e6
+
+        legacy_time, legacy_df = _best_of(run_legacy, path, args.repeat)
+        current_time, current_df = _best_of(run_current, path, args.repeat)
+
+        numeric = data_loader.EMPLOI_NUMERIC_COLUMNS
+        same = (
+            len(legacy_df) == len(current_df)
+            and (legacy_df[numeric].sum() - current_df[numeric].sum()).abs().max() < 1e-6
+        )
+
+    print(f"Fichier : {args.rows} lignes, {len(numeric) + args.extra_columns + 4} colonnes, {size_mb:.1f} Mo")
+    print(f"Avant : {legacy_time:.2f} s")
+    print(f"Après : {current_time:.2f} s  (x{legacy_time / current_time:.1f})")
+    print(f"Résultats identiques : {'oui' if same else 'NON'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,13 +14,14 @@ from utils.data_loader import (
     load_cities_data,
     get_city_list,
     get_weather_current,
-    get_weather_forecast
+    get_weather_forecast,
+    get_weather_history
 )
 
 st.set_page_config(page_title="Météo", page_icon="🌤️", layout="wide", initial_sidebar_state="collapsed")
 
 from utils.navbar import inject_navbar_css, render_navbar
-from utils.style import COLOR_LOW, COLOR_HIGH
+from utils.style import COLOR_LOW, COLOR_HIGH, SOFT
 
 inject_navbar_css()
 render_navbar("Météo")
@@ -53,6 +54,9 @@ if selected_city:
         current = weather_data['current_condition'][0]
         
         st.subheader("📍 Conditions Actuelles")
+        if weather_data.get('stale'):
+            updated_at = pd.Timestamp(weather_data['updated_at']).tz_convert('Europe/Paris')
+            st.caption(f"🔄 Relevé de {updated_at:%H:%M}, actualisation en cours")
         
         # Afficher les conditions immédiates avant les prévisions.
         col1, col2, col3, col4 = st.columns(4)
@@ -183,7 +187,60 @@ if selected_city:
     
     else:
         st.error("❌ Impossible de récupérer les données météo pour cette ville")
-    
+
+    st.divider()
+
+    # Historique de l'année lu dans la base locale (seuls les jours manquants sont demandés à l'archive).
+    st.subheader("📈 Depuis le 1er janvier")
+
+    today = pd.Timestamp.today().date()
+    history = get_weather_history(selected_city, today.replace(month=1, day=1), today)
+    history = history.dropna(subset=['tmax', 'tmin'], how='all')
+
+    if not history.empty:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🔺 Maximale de l'année", f"{history['tmax'].max():.1f}°C")
+        with col2:
+            st.metric("🔻 Minimale de l'année", f"{history['tmin'].min():.1f}°C")
+        with col3:
+            st.metric("🌧️ Cumul des précipitations", f"{history['precipitation'].sum():.0f} mm")
+
+        fig_history = go.Figure()
+        fig_history.add_trace(go.Bar(
+            x=history['date'],
+            y=history['precipitation'],
+            name='Précipitations (mm)',
+            marker_color=SOFT,
+            opacity=0.5,
+            yaxis='y2'
+        ))
+        fig_history.add_trace(go.Scatter(
+            x=history['date'],
+            y=history['tmax'],
+            mode='lines',
+            name='Température Max',
+            line=dict(color=COLOR_HIGH, width=2)
+        ))
+        fig_history.add_trace(go.Scatter(
+            x=history['date'],
+            y=history['tmin'],
+            mode='lines',
+            name='Température Min',
+            line=dict(color=COLOR_LOW, width=2)
+        ))
+        fig_history.update_layout(
+            title=f"Températures et précipitations journalières - {selected_city}",
+            xaxis_title="Date",
+            yaxis=dict(title="Température (°C)"),
+            yaxis2=dict(title="Précipitations (mm)", overlaying='y', side='right', showgrid=False),
+            hovermode='x unified',
+            height=420
+        )
+        st.plotly_chart(fig_history, use_container_width=True)
+    else:
+        st.warning("⚠️ Historique météo non disponible pour cette ville")
+
 
 st.markdown("""
 <div class="site-footer">
@@ -143,17 +143,17 @@ if selected_city:
                 
                 col1, col2 = st.columns(2)
                 
+                # Rangs précalculés au chargement du catalogue
                 with col1:
                     st.metric(
                         "Villes dans le département",
-                        len(same_dept) + 1
+                        city_info['nb_villes_departement']
                     )
                 
                 with col2:
-                    rank = (same_dept['population'] > city_info.get('population', 0)).sum() + 1
                     st.metric(
                         f"Rang de {selected_city}",
-                        f"#{rank}"
+                        f"#{city_info['rang_departement_population']}"
                     )
         
         st.divider()
@@ -161,21 +161,21 @@ if selected_city:
         # Donner enfin un repère national pour la commune choisie.
         st.subheader("🏘️ Contexte National")
         
-        if 'population' in city_info and 'population' in df_cities.columns:
+        if 'rang_national_population' in city_info:
+            # Rangs, percentile et parts précalculés au chargement du catalogue
             total_cities = len(df_cities)
-            rank = (df_cities['population'] > city_info['population']).sum() + 1
             
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
                 st.metric(
                     "Rang national",
-                    f"#{rank}",
+                    f"#{city_info['rang_national_population']}",
                     f"sur {total_cities}"
                 )
             
             with col2:
-                percentile = (1 - rank / total_cities) * 100
+                percentile = city_info['percentile_population']
                 st.metric(
                     "Percentile",
                     f"{percentile:.1f}%",
@@ -183,8 +183,7 @@ if selected_city:
                 )
             
             with col3:
-                avg_pop_national = df_cities['population'].mean()
-                diff_pct = ((city_info['population'] - avg_pop_national) / avg_pop_national * 100)
+                diff_pct = city_info['ecart_moyenne_population']
                 st.metric(
                     "vs Moyenne nationale",
                     f"{diff_pct:+.1f}%",
@@ -192,8 +191,7 @@ if selected_city:
                 )
             
             with col4:
-                total_pop = df_cities['population'].sum()
-                share = (city_info['population'] / total_pop * 100)
+                share = city_info['part_population']
                 st.metric(
                     "Part de la population",
                     f"{share:.2f}%",
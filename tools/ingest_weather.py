@@ -0,0 +1,53 @@
+"""
+Alimentation de l'historique météo local (utils/weather_store.py) depuis l'archive Open-Meteo.
+
+Pour chaque ville, seuls les jours absents ou encore provisoires de la période sont demandés
+(une requête par ville) ; relancer la commande chaque jour n'ajoute que les nouveaux jours.
+
+Usage : python tools/ingest_weather.py [--start 2026-01-01] [--end 2026-10-16] [--cities "Niort (79)" ...] [--workers 4]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils import data_loader
+
+
+def main() -> None:
+    today = date.today()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(today.year, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=today)
+    parser.add_argument("--cities", nargs="*", help="villes du catalogue (par défaut : toutes)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    cities = args.cities or data_loader.get_city_list(data_loader.load_cities_data())
+    if not cities:
+        sys.exit("Catalogue des villes indisponible")
+
+    start_time = time.perf_counter()
+    fetched, failed = 0, []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(data_loader.ingest_weather_history, city, args.start, args.end): city
+            for city in cities
+        }
+        for future in as_completed(futures):
+            try:
+                fetched += future.result()
+            except Exception as e:
+                failed.append(f"{futures[future]} ({e})")
+
+    print(f"{len(cities)} villes, {fetched} jours demandés à l'archive en {time.perf_counter() - start_time:.1f} s")
+    if failed:
+        print(f"Échecs ({len(failed)}) : {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Serveur local rejouant les réponses enregistrées d'OpenDataSoft et d'Open-Meteo,
+pour mesurer hors ligne et de façon reproductible les chemins de démarrage à froid et d'absence de cache.
+
+1. Enregistrer une session réelle (réseau nécessaire) :
+       METAPOLIS_HTTP_RECORD_DIR=data/recordings streamlit run app.py
+2. Rejouer sans réseau :
+       python tools/replay_server.py data/recordings --latency-ms 150 --jitter-ms 50 --error-rate 0.05 --seed 1
+   puis lancer l'application vers le serveur :
+       METAPOLIS_OPENDATASOFT_URL=http://127.0.0.1:8765 \\
+       METAPOLIS_OPEN_METEO_URL=http://127.0.0.1:8765 \\
+       METAPOLIS_OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Les réponses sont retrouvées par chemin et paramètres de requête (utils/http_client.recording_key) ;
+--ignore-param permet de rejouer des requêtes datées (ex. start_date, end_date de l'archive) un autre jour.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.http_client import recording_key
+
+
+def load_recordings(record_dir: Path, ignored_params) -> dict:
+    """
+    Indexe les enregistrements du dossier (tous hôtes confondus) par clé de requête
+    """
+    recordings = {}
+    for path in sorted(record_dir.glob("*/*.json")):
+        with open(path, encoding="utf-8") as f:
+            recording = json.load(f)
+        parsed = urlparse(recording['url'])
+        recordings[recording_key(parsed.path, parsed.query, ignored_params)] = recording
+    return recordings
+
+
+def make_handler(recordings: dict, args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    rng_lock = threading.Lock()
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: bytes, headers: dict) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # Tirages sous verrou : la même graine donne la même suite de latences et d'erreurs.
+            with rng_lock:
+                delay = max(0.0, args.latency_ms + rng.uniform(-args.jitter_ms, args.jitter_ms)) / 1000
+                draw = rng.random()
+            time.sleep(delay)
+
+            if draw < args.hang_rate:
+                # Pas de réponse : le client atteint son délai d'attente.
+                time.sleep(args.hang_seconds)
+                self.close_connection = True
+                return
+            if draw < args.hang_rate + args.error_rate:
+                body = json.dumps({"error": "erreur injectée"}).encode("utf-8")
+                self._send(args.error_status, body, {"Content-Type": "application/json"})
+                return
+
+            parsed = urlparse(self.path)
+            recording = recordings.get(recording_key(parsed.path, parsed.query, args.ignore_param))
+            if recording is None:
+                body = json.dumps({"error": "aucun enregistrement pour cette requête"}).encode("utf-8")
+                self._send(404, body, {"Content-Type": "application/json"})
+                return
+
+            headers = recording['headers']
+            if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+                self._send(304, b"", {"ETag": headers['ETag']})
+                return
+            self._send(recording['status'], recording['body'].encode("utf-8"), headers)
+
+        def log_message(self, format, *log_args):
+            if not args.quiet:
+                super().log_message(format, *log_args)
+
+    return ReplayHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("record_dir", type=Path, help="dossier des enregistrements (METAPOLIS_HTTP_RECORD_DIR)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="latence ajoutée à chaque réponse")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="variation aléatoire de la latence (±)")
+    parser.add_argument("--error-rate", type=float, default=0, help="part des requêtes en erreur")
+    parser.add_argument("--error-status", type=int, default=503, help="code des erreurs injectées")
+    parser.add_argument("--hang-rate", type=float, default=0, help="part des requêtes sans réponse")
+    parser.add_argument("--hang-seconds", type=float, default=15, help="durée d'une requête sans réponse")
+    parser.add_argument("--ignore-param", action="append", default=[], help="paramètre ignoré pour retrouver un enregistrement")
+    parser.add_argument("--seed", type=int, default=0, help="graine des latences et erreurs injectées")
+    parser.add_argument("--quiet", action="store_true", help="ne pas journaliser chaque requête")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.record_dir, args.ignore_param)
+    if not recordings:
+        sys.exit(f"Aucun enregistrement dans {args.record_dir}")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(recordings, args))
+    print(f"{len(recordings)} réponses rejouées sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,212 @@
 """
 Module de chargement et de gestion des données pour l'application de comparaison de villes
 """
+import codecs
+import copy
+import csv
+import functools
+import logging
+import os
 import re
-import requests
+import sqlite3
+import threading
+import unicodedata
+import weakref
+from array import array
+import numpy as np
 import pandas as pd
+import requests
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
-
-# URL de base pour l'API des villes (sans le filtre de pays)
-CITIES_API_BASE_URL = "https://public.opendatasoft.com/api/records/1.0/search/?dataset=geonames-all-cities-with-a-population-1000&q=population>20000&rows=1000"
+from typing import Dict, List, Optional, Tuple
+
+from utils import disk_cache
+from utils import http_client
+from utils import swr_cache
+from utils import weather_store
+
+logger = logging.getLogger(__name__)
+
+# Seuil de population des villes retenues
+CITIES_MIN_POPULATION = 20000
+# Adresses des services externes, remplaçables par variable d'environnement (ex. serveur de rejeu tools/replay_server.py)
+OPENDATASOFT_BASE_URL = os.environ.get("METAPOLIS_OPENDATASOFT_URL", "https://public.opendatasoft.com").rstrip("/")
+OPEN_METEO_BASE_URL = os.environ.get("METAPOLIS_OPEN_METEO_URL", "https://api.open-meteo.com").rstrip("/")
+OPEN_METEO_ARCHIVE_BASE_URL = os.environ.get("METAPOLIS_OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com").rstrip("/")
+# URL de base pour l'API des villes (sans le filtre de pays ni la pagination)
+CITIES_API_BASE_URL = f"{OPENDATASOFT_BASE_URL}/api/records/1.0/search/?dataset=geonames-all-cities-with-a-population-1000&q=population>{CITIES_MIN_POPULATION}"
+# Nombre d'enregistrements demandés par page
+CITIES_PAGE_SIZE = 1000
 # Codes pays pour la France et les DOM-TOM
 FRANCE_TERRITORIES = ['FR', 'GP', 'MQ', 'GF', 'RE', 'YT', 'NC', 'PF', 'PM', 'WF', 'BL', 'MF']
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+# Délai global (en secondes) accordé au chargement concurrent de tous les territoires
+CITIES_FETCH_DEADLINE = 15
+OPEN_METEO_URL = f"{OPEN_METEO_BASE_URL}/v1/forecast"
+OPEN_METEO_ARCHIVE_URL = f"{OPEN_METEO_ARCHIVE_BASE_URL}/v1/archive"
+# Météo actuelle de tout le catalogue : coordonnées par requête Open-Meteo et requêtes simultanées
+OPEN_METEO_BATCH_SIZE = 100
+OPEN_METEO_BATCH_WORKERS = 4
+OPEN_METEO_CURRENT_VARIABLES = "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,wind_speed_10m,weather_code"
+# Météo par ville (utils/swr_cache.py) : durée de validité, actualisation anticipée,
+# durée de suivi d'une ville non redemandée (en secondes) et nombre maximal de villes suivies
+WEATHER_TTL = 1800
+WEATHER_REFRESH_AHEAD = 300
+WEATHER_KEEP_FOR = 2 * 3600
+WEATHER_MAX_CITIES = 512
 
 # Chemin vers les fichiers de données
 LOGEMENT_FILE = Path(__file__).parent.parent / "data" / "logement.csv"
 EMPLOI_FILE = Path(__file__).parent.parent / "data" / "emploi.csv"
 
+# Détection du format des CSV INSEE (échantillon lu, candidats, manifeste local)
+INSEE_SNIFF_BYTES = 64 * 1024
+INSEE_SEPARATORS = (';', ',', '\t')
+INSEE_ENCODINGS = ('utf-8-sig', 'latin-1')
+INSEE_MAX_HEADER_OFFSET = 10
+INSEE_DIALECT_MANIFEST = "insee_dialects"
+INSEE_DIALECT_VERSION = 3
+INSEE_SNIFF_DATA_LINES = 50
+# Ligne de codes de variables sous l'en-tête (ex: "CODGEO;LIBGEO;P22_POP1564")
+_INSEE_CODE_ROW_PATTERN = re.compile(r'^[A-Z][A-Z0-9_]*$')
+# Nombres au format français : "1 234,5", "1\u202f234,5", "12,75"
+_FR_DECIMAL_PATTERN = re.compile(r'^-?\d[\d \u202f\u00a0]*,\d+$')
+_SPACE_THOUSANDS_PATTERN = re.compile(r'^-?\d{1,3}(?: \d{3})+(?:[.,]\d+)?$')
+# Nettoyage des nombres en une seule passe : espaces (fines) insécables, espaces, virgule décimale
+_NUMBER_TRANSLATION = str.maketrans({'\u202f': None, '\u00a0': None, ' ': None, ',': '.'})
+# Valeurs non numériques des fichiers INSEE lues comme manquantes (secret statistique, non disponible)
+INSEE_MISSING_MARKERS = ['s', 'nd', 'ns', 'nc']
+
+# Colonnes lues dans le fichier emploi (les autres colonnes IRIS sont ignorées)
+EMPLOI_LABEL_COLUMNS = ['Code géographique', 'Libellé géographique', 'Département', 'Région']
+EMPLOI_NUMERIC_COLUMNS = [
+    'Pop 15-64 ans en 2022 (princ)',
+    'Actifs 15-64 ans en 2022 (princ)',
+    'Actifs occupés 15-64 ans en 2022 (princ)',
+    'Chômeurs 15-64 ans en 2022 (princ)',
+    'Inactifs 15-64 ans en 2022 (princ)',
+    'Élèves, étudiants et stagiaires non rémunérés 15-64 ans en 2022 (princ)',
+    'Retraités ou préretraités 15-64 ans en 2022 (princ)',
+    'Autres inactifs 15-64 ans en 2022 (princ)',
+    # Diplômes des actifs
+    'Actifs Sans diplôme ou CEP en 2022 (princ)',
+    'Actifs BEPC, brevet des collèges, DNB en 2022 (princ)',
+    'Actifs CAP-BEP ou équiv. en 2022 (princ)',
+    'Actifs Bac, brevet pro. ou équiv.  en 2022 (princ)',
+    'Actifs Enseignement sup de niveau bac + 2  en 2022 (princ)',
+    'Actifs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
+    'Actifs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
+    # Diplômes des chômeurs
+    'Chômeurs Sans diplôme ou CEP en 2022 (princ)',
+    'Chômeurs BEPC, brevet des collèges, DNB en 2022 (princ)',
+    'Chômeurs CAP-BEP ou équiv. en 2022 (princ)',
+    'Chômeurs Bac, brevet pro. ou équiv.  en 2022 (princ)',
+    'Chômeurs Enseignement sup de niveau bac + 2  en 2022 (princ)',
+    'Chômeurs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
+    'Chômeurs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
+    # PCS (Professions et Catégories Socioprofessionnelles)
+    'Actifs 15-64 ans Agriculteurs exploitants en 2022 (compl)',
+    'Actifs 15-64 ans Artisans, Comm., Chefs entr. en 2022 (compl)',
+    'Actifs 15-64 ans Cadres, Prof. intel. sup. en 2022 (compl)',
+    'Actifs 15-64 ans Prof. intermédiaires en 2022 (compl)',
+    'Actifs 15-64 ans Employés en 2022 (compl)',
+    'Actifs 15-64 ans Ouvriers en 2022 (compl)',
+]
+
+# Colonnes lues dans le fichier logement
+LOGEMENT_LABEL_COLUMNS = ['Iris', 'Commune ou ARM', 'Libellé commune ou ARM', 'Département']
+LOGEMENT_NUMERIC_COLUMNS = [
+    'Logements en 2022 (princ)',
+    'Résidences principales en 2022 (princ)',
+    'Rés secondaires et logts occasionnels en 2022 (princ)',
+    'Logements vacants en 2022 (princ)',
+    'Maisons en 2022 (princ)',
+    'Appartements en 2022 (princ)',
+    'Rés princ 1 pièce en 2022 (princ)',
+    'Rés princ 2 pièces en 2022 (princ)',
+    'Rés princ 3 pièces en 2022 (princ)',
+    'Rés princ 4 pièces en 2022 (princ)',
+    'Rés princ 5 pièces ou plus en 2022 (princ)',
+    'Pièces rés princ en 2022 (princ)',
+    'Ménages en 2022 (princ)',
+    'Rés princ occupées Propriétaires en 2022 (princ)',
+    'Rés princ occupées Locataires en 2022 (princ)',
+    'Rés princ HLM louée vide en 2022 (princ)',
+    'Ménages au moins une voiture en 2022 (princ)',
+    'Ménages deux voitures ou plus en 2022 (princ)'
+]
+
+# Effectifs emploi exposés par get_employment_data (clé du résultat → colonne INSEE)
+EMPLOI_COUNT_COLUMNS = {
+    'population_15_64': 'Pop 15-64 ans en 2022 (princ)',
+    'actifs': 'Actifs 15-64 ans en 2022 (princ)',
+    'actifs_occupes': 'Actifs occupés 15-64 ans en 2022 (princ)',
+    'chomeurs': 'Chômeurs 15-64 ans en 2022 (princ)',
+    'inactifs': 'Inactifs 15-64 ans en 2022 (princ)',
+    'etudiants': 'Élèves, étudiants et stagiaires non rémunérés 15-64 ans en 2022 (princ)',
+    'retraites': 'Retraités ou préretraités 15-64 ans en 2022 (princ)',
+    'autres_inactifs': 'Autres inactifs 15-64 ans en 2022 (princ)',
+}
+
+# Diplômes (7 niveaux) et PCS utilisés par get_formation_data
+DIPLOME_LABELS = [
+    'Sans diplôme / CEP',
+    'BEPC / Brevet',
+    'CAP-BEP',
+    'Bac / Brevet pro.',
+    'Bac+2',
+    'Bac+3/4',
+    'Bac+5 et plus',
+]
+ACTIFS_DIPLOME_COLUMNS = EMPLOI_NUMERIC_COLUMNS[8:15]
+CHOMEURS_DIPLOME_COLUMNS = EMPLOI_NUMERIC_COLUMNS[15:22]
+PCS_LABELS = [
+    'Agriculteurs',
+    'Artisans / Comm.',
+    'Cadres',
+    'Prof. intermédiaires',
+    'Employés',
+    'Ouvriers',
+]
+PCS_COLUMNS = EMPLOI_NUMERIC_COLUMNS[22:28]
+
+# Effectifs logement exposés par get_housing_data (clé du résultat → colonne INSEE)
+LOGEMENT_COUNT_COLUMNS = {
+    'nombre_logements': 'Logements en 2022 (princ)',
+    'nombre_residences_principales': 'Résidences principales en 2022 (princ)',
+    'nombre_residences_secondaires': 'Rés secondaires et logts occasionnels en 2022 (princ)',
+    'nombre_logements_vacants': 'Logements vacants en 2022 (princ)',
+    'nombre_maisons': 'Maisons en 2022 (princ)',
+    'nombre_appartements': 'Appartements en 2022 (princ)',
+    'nombre_menages': 'Ménages en 2022 (princ)',
+    'nb_proprietaires': 'Rés princ occupées Propriétaires en 2022 (princ)',
+    'nb_locataires': 'Rés princ occupées Locataires en 2022 (princ)',
+    'nb_hlm': 'Rés princ HLM louée vide en 2022 (princ)',
+}
+
+# Tables communales agrégées mises en cache (Feather), invalidées par l'empreinte du CSV source
+EMPLOI_CACHE = "communes_emploi"
+LOGEMENT_CACHE = "communes_logement"
+INSEE_CACHE_VERSION = 2
+
+# Colonnes du catalogue classées au chargement (rangs national et départemental, percentile)
+RANKED_CITY_COLUMNS = ['population', 'altitude']
+
+# Instantané local du catalogue des villes (voir utils/disk_cache.py)
+CITIES_SNAPSHOT = "villes"
+# Intervalle minimal (en secondes) entre deux revalidations de l'instantané
+CITIES_REVALIDATE_INTERVAL = 3600
+_cities_revalidation_lock = threading.Lock()
+_cities_revalidation_thread: Optional[threading.Thread] = None
+
+# Index des villes par version du catalogue (voir _get_city_index) ; les catalogues
+# sans version sont indexés une fois par objet DataFrame (référence faible)
+_city_indexes: Dict[str, Dict[str, Dict]] = {}
+_unversioned_city_indexes: Dict[int, Tuple[weakref.ref, Dict[str, Dict]]] = {}
+_city_index_lock = threading.Lock()
+_CITY_INDEX_MAX_VERSIONS = 4
+
 
 def format_int_fr(value) -> str:
     """
@@ -72,11 +261,164 @@ def _fallback_weather_current() -> Dict:
     }
 
 
-def _read_insee_csv(file_path: Path, required_columns: List[str]) -> pd.DataFrame:
+def _strip_column_names(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalise les noms de colonnes pour gérer les exports INSEE hétérogènes
+    """
+    rename_map = {
+        original: str(original).strip()
+        for original in df.columns
+        if str(original) != str(original).strip()
+    }
+    return df.rename(columns=rename_map) if rename_map else df
+
+
+def _sniff_number_format(data_lines: List[str], sep: str) -> Dict:
+    """
+    Détecte le séparateur décimal et le séparateur de milliers (espace simple)
+    utilisés dans les premières lignes de données.
+    Les espaces insécables ne sont pas gérés par le lecteur CSV : les colonnes
+    concernées passent par la conversion de secours (_to_numeric_safe).
+    """
+    decimal = '.'
+    thousands = None
+    for line in data_lines:
+        for field in next(csv.reader([line], delimiter=sep), []):
+            field = field.strip()
+            if sep != ',' and _FR_DECIMAL_PATTERN.match(field):
+                decimal = ','
+            if _SPACE_THOUSANDS_PATTERN.match(field):
+                thousands = ' '
+    # Les nombres à virgule décimale groupent les milliers par espaces : autoriser l'espace simple.
+    if decimal == ',':
+        thousands = ' '
+    return {'decimal': decimal, 'thousands': thousands}
+
+
+def _sniff_insee_dialect(file_path: Path, required_columns: List[str]) -> Optional[Dict]:
+    """
+    Détermine le séparateur, l'encodage et la ligne d'en-tête d'un CSV INSEE
+    à partir des premiers Ko du fichier seulement
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(INSEE_SNIFF_BYTES)
+
+    for encoding in INSEE_ENCODINGS:
+        try:
+            # Décodage incrémental : l'échantillon peut couper un caractère multi-octets.
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+
+        lines = text.splitlines()
+        for skiprows, line in enumerate(lines[:INSEE_MAX_HEADER_OFFSET + 1]):
+            for sep in INSEE_SEPARATORS:
+                fields = {field.strip() for field in next(csv.reader([line], delimiter=sep), [])}
+                if all(col in fields for col in required_columns):
+                    # Repérer la ligne de codes de variables qui suit parfois l'en-tête.
+                    next_fields = []
+                    if skiprows + 1 < len(lines):
+                        next_fields = [f.strip() for f in next(csv.reader([lines[skiprows + 1]], delimiter=sep), [])]
+                    non_empty = [f for f in next_fields if f]
+                    code_row = bool(non_empty) and all(_INSEE_CODE_ROW_PATTERN.match(f) for f in non_empty)
+                    first_data_line = skiprows + (2 if code_row else 1)
+                    data_lines = lines[first_data_line:first_data_line + INSEE_SNIFF_DATA_LINES]
+                    return {
+                        'sep': sep,
+                        'encoding': encoding,
+                        'skiprows': skiprows,
+                        'code_row': code_row,
+                        **_sniff_number_format(data_lines, sep)
+                    }
+
+    return None
+
+
+def _get_insee_dialect(file_path: Path, required_columns: List[str]) -> Optional[Dict]:
+    """
+    Retourne le format d'un CSV INSEE depuis le manifeste local
+    (clé : taille et date de modification du fichier), ou le détecte puis l'enregistre
+    """
+    stat = file_path.stat()
+    manifest = disk_cache.read_json(INSEE_DIALECT_MANIFEST) or {}
+    entry = manifest.get(file_path.name)
+    if (
+        entry
+        and entry.get('version') == INSEE_DIALECT_VERSION
+        and entry.get('size') == stat.st_size
+        and entry.get('mtime') == stat.st_mtime
+    ):
+        return entry['dialect']
+
+    dialect = _sniff_insee_dialect(file_path, required_columns)
+    if dialect is not None:
+        manifest[file_path.name] = {
+            'version': INSEE_DIALECT_VERSION,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'dialect': dialect
+        }
+        try:
+            disk_cache.write_json(INSEE_DIALECT_MANIFEST, manifest)
+        except OSError as e:
+            logger.warning("Impossible d'enregistrer le manifeste INSEE : %s", e)
+    return dialect
+
+
+def _read_insee_csv(
+    file_path: Path,
+    required_columns: List[str],
+    label_columns: Optional[List[str]] = None,
+    numeric_columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
     Lit un CSV INSEE en gérant les variations de séparateur,
     d'encodage et de lignes d'en-tête.
+    Le format est détecté sur un échantillon (et mémorisé) pour ne lire le fichier qu'une fois ;
+    les combinaisons classiques ne sont essayées qu'en dernier recours.
+    Si des colonnes sont déclarées, seules celles-ci sont lues : libellés en texte,
+    indicateurs convertis à la lecture selon le format numérique détecté
+    (marqueurs INSEE_MISSING_MARKERS lus comme valeurs manquantes).
     """
+    labels = set(label_columns or [])
+    wanted = labels | set(numeric_columns or []) | set(required_columns)
+    projected = label_columns is not None or numeric_columns is not None
+
+    dialect = _get_insee_dialect(file_path, required_columns)
+    if dialect is not None:
+        options = {
+            'sep': dialect['sep'],
+            'encoding': dialect['encoding'],
+            'decimal': dialect.get('decimal', '.'),
+            'thousands': dialect.get('thousands'),
+        }
+        skiprows = dialect['skiprows']
+        if dialect.get('code_row'):
+            options['skiprows'] = list(range(skiprows)) + [skiprows + 1]
+        else:
+            options['skiprows'] = skiprows
+
+        try:
+            if projected:
+                # Projeter sur les colonnes utiles (les noms bruts peuvent contenir des espaces).
+                header = pd.read_csv(file_path, nrows=0, **options).columns
+                options['usecols'] = [raw for raw in header if str(raw).strip() in wanted]
+                # Libellés et codes en texte ; les indicateurs sont convertis par le lecteur
+                # (décimale et milliers détectés), sans passe de nettoyage supplémentaire.
+                # Les marqueurs de secret statistique sont lus comme manquants pour que
+                # la colonne reste numérique.
+                options['dtype'] = {raw: str for raw in options['usecols'] if str(raw).strip() in labels}
+                options['na_values'] = {
+                    raw: INSEE_MISSING_MARKERS for raw in options['usecols'] if str(raw).strip() not in labels
+                }
+            df = pd.read_csv(file_path, **options)
+
+            df = _strip_column_names(df)
+            if not df.empty and all(col in df.columns for col in required_columns):
+                return df
+        except Exception as e:
+            logger.warning("Format détecté invalide pour %s : %s", file_path, e)
+
     read_attempts = [
         {"sep": ";", "encoding": "utf-8-sig"},
         {"sep": ";", "encoding": "latin-1"},
@@ -85,22 +427,17 @@ def _read_insee_csv(file_path: Path, required_columns: List[str]) -> pd.DataFram
         {"sep": None, "encoding": "utf-8-sig", "engine": "python"},
     ]
 
+    # Même projection en dernier recours, tout en texte : les indicateurs
+    # sont alors convertis par _to_numeric_safe.
+    projection = {'usecols': lambda raw: str(raw).strip() in wanted, 'dtype': str} if projected else {}
     for skiprows in (0, 4):
         for options in read_attempts:
             try:
-                df = pd.read_csv(file_path, skiprows=skiprows, **options)
+                df = pd.read_csv(file_path, skiprows=skiprows, **options, **projection)
                 if df.empty:
                     continue
 
-                # Normaliser les noms de colonnes pour gérer les exports INSEE hétérogènes.
-                rename_map = {
-                    original: str(original).strip()
-                    for original in df.columns
-                    if str(original) != str(original).strip()
-                }
-                if rename_map:
-                    df = df.rename(columns=rename_map)
-
+                df = _strip_column_names(df)
                 if all(col in df.columns for col in required_columns):
                     return df
             except Exception:
@@ -113,54 +450,353 @@ def _to_numeric_safe(series: pd.Series) -> pd.Series:
     """
     Convertit une série en numérique en gérant les espaces insécables,
     séparateurs de milliers et virgules décimales.
+    Conversion de secours pour les colonnes que le lecteur CSV n'a pas pu typer.
     """
     if pd.api.types.is_numeric_dtype(series):
         return series
 
-    cleaned = (
-        series.astype(str)
-        .str.replace('\u202f', '', regex=False)
-        .str.replace(' ', '', regex=False)
-        .str.replace(',', '.', regex=False)
-        .replace({'': None, 'nan': None, 'None': None})
-    )
+    # Une seule passe de nettoyage ; les valeurs vides ou invalides deviennent NaN.
+    cleaned = series.astype(str).str.translate(_NUMBER_TRANSLATION)
     return pd.to_numeric(cleaned, errors='coerce')
 
 
-def _is_arrondissement(ville_name: str) -> bool:
+# Arrondissements : "Paris 10e Arrondissement", "Lyon 3e arrondissement", "Marseille 01"
+_ARRONDISSEMENT_PATTERN = re.compile(
+    r'\s+\d+(?:er|e|ème)\s+[Aa]rrondissement|^(?:Paris|Marseille|Lyon)\s+\d{2}$'
+)
+_MAIN_CITY_PATTERN = re.compile(r'^(Paris|Marseille|Lyon)')
+
+
+class _CityColumns:
     """
-    Détecte si un nom de ville correspond à un arrondissement
-    Ex: "Paris 10e Arrondissement", "Marseille 01", "Lyon 03"
+    Tampons colonnaires des villes, alimentés page par page.
+    Les champs numériques sont stockés dans des tableaux typés plutôt
+    que dans une liste de dictionnaires.
     """
-    if not ville_name:
-        return False
-    
-    arrondissement_pattern = r'\s+\d+(er|e|ème)\s+(Arrondissement|arrondissement)'
-    if re.search(arrondissement_pattern, ville_name):
-        return True
-    
-    short_pattern = r'^(Paris|Marseille|Lyon)\s+\d{2}$'
-    if re.search(short_pattern, ville_name):
+    TEXT_FIELDS = ('name', 'region_code', 'departement_code', 'pays', 'timezone')
+
+    def __init__(self):
+        self.text = {field: [] for field in self.TEXT_FIELDS}
+        self.population = array('q')
+        self.altitude = array('d')
+        self.lat = array('d')
+        self.lon = array('d')
+
+    def __len__(self) -> int:
+        return len(self.population)
+
+    def append_records(self, records: List[Dict]) -> None:
+        """
+        Ajoute les enregistrements bruts d'une page OpenDataSoft aux tampons
+        """
+        nan = float('nan')
+        for record in records:
+            fields = record.get('fields', {})
+            coordinates = fields.get('coordinates', [None, None])
+            has_coordinates = isinstance(coordinates, list) and len(coordinates) >= 2
+
+            self.text['name'].append(fields.get('name'))
+            self.text['region_code'].append(fields.get('admin1_code'))
+            self.text['departement_code'].append(fields.get('admin2_code'))
+            self.text['pays'].append(fields.get('country_code'))
+            self.text['timezone'].append(fields.get('timezone'))
+            self.population.append(int(fields.get('population') or 0))
+            self.altitude.append(float(fields['dem']) if fields.get('dem') is not None else nan)
+            self.lat.append(float(coordinates[0]) if has_coordinates and coordinates[0] is not None else nan)
+            self.lon.append(float(coordinates[1]) if has_coordinates and coordinates[1] is not None else nan)
+
+    def extend(self, other: '_CityColumns') -> None:
+        """
+        Fusionne les tampons d'un autre territoire
+        """
+        for field in self.TEXT_FIELDS:
+            self.text[field].extend(other.text[field])
+        self.population.extend(other.population)
+        self.altitude.extend(other.altitude)
+        self.lat.extend(other.lat)
+        self.lon.extend(other.lon)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Construit le DataFrame brut (un enregistrement par ligne) à partir des tampons
+        """
+        if not len(self):
+            return pd.DataFrame()
+        return pd.DataFrame({
+            'name': self.text['name'],
+            'population': np.frombuffer(self.population, dtype=np.int64),
+            'region_code': self.text['region_code'],
+            'departement_code': self.text['departement_code'],
+            'pays': self.text['pays'],
+            'timezone': self.text['timezone'],
+            'altitude': np.frombuffer(self.altitude, dtype=np.float64),
+            'lat': np.frombuffer(self.lat, dtype=np.float64),
+            'lon': np.frombuffer(self.lon, dtype=np.float64),
+        })
+
+
+def _normalize_cities(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalise les enregistrements bruts en une seule passe colonnaire :
+    regroupe les arrondissements sous leur ville principale, écarte les doublons
+    parisiens, construit le libellé affiché puis fusionne les arrondissements.
+    """
+    if df.empty:
+        return df
+
+    names = df['name']
+    departement_codes = df['departement_code']
+
+    # Regrouper les arrondissements sous la ville principale.
+    is_arrondissement = names.str.contains(_ARRONDISSEMENT_PATTERN, na=False)
+    main_city = names.str.extract(_MAIN_CITY_PATTERN, expand=False)
+    ville_nom = main_city.where(is_arrondissement & main_city.notna(), names)
+
+    # Éviter les doublons d'arrondissements pour Paris.
+    keep = ~((departement_codes == '75') & (ville_nom != 'Paris'))
+
+    # Désambiguïser les villes homonymes dans les listes de sélection.
+    has_label = ville_nom.fillna('').ne('') & departement_codes.fillna('').ne('')
+    ville = (ville_nom + ' (' + departement_codes + ')').where(has_label, ville_nom)
+
+    df = df.assign(ville=ville, ville_nom=ville_nom)[keep].drop(columns='name')
+
+    # Fusionner les arrondissements pour obtenir une ligne par grande ville.
+    agg_dict = {
+        'population': 'sum',
+        'lat': 'mean',
+        'lon': 'mean',
+        'altitude': 'mean',
+        'region_code': 'first',
+        'departement_code': 'first',
+        'pays': 'first',
+        'timezone': 'first',
+        'ville_nom': 'first'
+    }
+    return df.groupby('ville', as_index=False).agg(agg_dict)
+
+
+def _normalize_departement_code(value) -> str:
+    """
+    Normalise un code département pour éviter les écarts de format (ex: 01 vs 1)
+    """
+    if pd.isna(value):
+        return ''
+    txt = str(value).strip().upper()
+    if txt.isdigit():
+        return str(int(txt))
+    return txt
+
+
+def _add_rank_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute au catalogue, en un seul passage au chargement :
+    - rang_national_<col>, percentile_<col>, rang_departement_<col> pour RANKED_CITY_COLUMNS
+      (rang 1 = valeur la plus élevée, ex æquo au même rang)
+    - nb_villes_departement, part_population et ecart_moyenne_population (en %)
+    """
+    if df.empty or 'departement_code' not in df.columns:
+        return df
+
+    total = len(df)
+    departements = df['departement_code'].map(_normalize_departement_code)
+    df['nb_villes_departement'] = departements.map(departements.value_counts()).astype(int)
+
+    for column in RANKED_CITY_COLUMNS:
+        if column not in df.columns:
+            continue
+        ranks = df[column].rank(method='min', ascending=False)
+        df[f'rang_national_{column}'] = ranks.astype('Int64')
+        df[f'percentile_{column}'] = (1 - ranks / total) * 100
+        df[f'rang_departement_{column}'] = (
+            df[column].groupby(departements).rank(method='min', ascending=False).astype('Int64')
+        )
+
+    if 'population' in df.columns:
+        total_population = df['population'].sum()
+        mean_population = df['population'].mean()
+        df['part_population'] = (df['population'] / total_population * 100) if total_population > 0 else 0.0
+        df['ecart_moyenne_population'] = (df['population'] - mean_population) / mean_population * 100
+    return df
+
+
+def _territory_page_url(country_code: str, start: int = 0) -> str:
+    return (
+        f"{CITIES_API_BASE_URL}&rows={CITIES_PAGE_SIZE}&start={start}"
+        f"&refine.country_code={country_code}"
+    )
+
+
+def _response_validators(response) -> Dict:
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def _fetch_territory_columns(country_code: str) -> Tuple[_CityColumns, Dict]:
+    """
+    Récupère toutes les pages OpenDataSoft d'un territoire français
+    et les verse au fur et à mesure dans des tampons colonnaires.
+    Retourne aussi les validateurs HTTP (ETag, Last-Modified) de la première page.
+    """
+    columns = _CityColumns()
+    validators = {}
+    start = 0
+
+    while True:
+        response = http_client.get(_territory_page_url(country_code, start), timeout=10)
+        response.raise_for_status()
+        if start == 0:
+            validators = _response_validators(response)
+        data = response.json()
+        records = data.get('records', [])
+
+        columns.append_records(records)
+        start += len(records)
+
+        # Suivre la pagination jusqu'à avoir lu tous les enregistrements annoncés.
+        if not records or start >= data.get('nhits', 0):
+            break
+
+    return columns, validators
+
+
+def _territory_is_modified(country_code: str, validators: Dict) -> bool:
+    """
+    Revalide la première page d'un territoire par requête conditionnelle
+    (If-None-Match / If-Modified-Since). Sans validateur connu, le territoire
+    est considéré comme modifié.
+    """
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    if not headers:
         return True
-    
-    return False
 
+    response = http_client.get(_territory_page_url(country_code), headers=headers, timeout=10)
+    if response.status_code == 304:
+        return False
+    response.raise_for_status()
+    return True
 
-def _extract_main_city_name(ville_name: str) -> Optional[str]:
+
+def _download_cities() -> Tuple[pd.DataFrame, Dict[str, Dict], List[str]]:
     """
-    Extrait le nom de la ville principale d'un arrondissement
-    Ex: "Paris 10e Arrondissement" -> "Paris"
-        "Marseille 01" -> "Marseille"
-        "Lyon 3e Arrondissement" -> "Lyon"
+    Télécharge le catalogue complet des villes depuis OpenDataSoft.
+    Retourne le DataFrame agrégé, les validateurs HTTP par territoire
+    et la liste des erreurs rencontrées (territoires manquants).
     """
-    if not ville_name:
-        return None
-    
-    match = re.match(r'^(Paris|Marseille|Lyon)', ville_name)
-    if match:
-        return match.group(1)
-    
-    return None
+    columns = _CityColumns()
+    validators = {}
+    errors = []
+
+    # Interroger tous les territoires en parallèle et fusionner les réponses dès leur arrivée.
+    executor = ThreadPoolExecutor(max_workers=len(FRANCE_TERRITORIES))
+    futures = {
+        executor.submit(_fetch_territory_columns, country_code): country_code
+        for country_code in FRANCE_TERRITORIES
+    }
+    try:
+        for future in as_completed(futures, timeout=CITIES_FETCH_DEADLINE):
+            country_code = futures[future]
+            try:
+                territory_columns, validators[country_code] = future.result()
+                columns.extend(territory_columns)
+            except Exception as e:
+                errors.append(f"Impossible de charger les données pour {country_code}: {e}")
+    except FuturesTimeoutError:
+        pending = [code for future, code in futures.items() if not future.done()]
+        errors.append(f"Délai dépassé pour les territoires : {', '.join(pending)}")
+    finally:
+        # Ne pas attendre les territoires en retard au-delà du délai global.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    df = _normalize_cities(columns.to_frame())
+
+    return df, validators, errors
+
+
+def _write_cities_snapshot(df: pd.DataFrame, validators: Dict[str, Dict], fetched_at: str) -> None:
+    disk_cache.write_snapshot(CITIES_SNAPSHOT, df, {
+        'fetched_at': fetched_at,
+        'checked_at': fetched_at,
+        'content_hash': disk_cache.frame_digest(df),
+        'validators': validators,
+    })
+
+
+def _checked_recently(meta: Dict) -> bool:
+    """
+    Indique si l'instantané a été revalidé il y a moins de CITIES_REVALIDATE_INTERVAL
+    """
+    try:
+        checked_at = datetime.fromisoformat(meta['checked_at'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return (datetime.now(timezone.utc) - checked_at).total_seconds() < CITIES_REVALIDATE_INTERVAL
+
+
+def _revalidate_cities_snapshot() -> None:
+    """
+    Revalide l'instantané local des villes en arrière-plan, au plus une fois par
+    CITIES_REVALIDATE_INTERVAL. Ne retélécharge le catalogue que si au moins un territoire
+    a pu changer, et n'invalide le cache mémoire (nouvelle version du catalogue)
+    que si le contenu téléchargé diffère de l'instantané.
+    """
+    try:
+        _, meta = disk_cache.read_snapshot(CITIES_SNAPSHOT)
+        if _checked_recently(meta):
+            return
+        known_validators = meta.get('validators', {})
+
+        with ThreadPoolExecutor(max_workers=len(FRANCE_TERRITORIES)) as executor:
+            modified = list(executor.map(
+                lambda code: _territory_is_modified(code, known_validators.get(code, {})),
+                FRANCE_TERRITORIES
+            ))
+
+        if not any(modified):
+            meta['checked_at'] = datetime.now(timezone.utc).isoformat()
+            disk_cache.write_json(CITIES_SNAPSHOT, meta)
+            return
+
+        df, validators, errors = _download_cities()
+        if df.empty or errors:
+            logger.warning("Revalidation du catalogue des villes incomplète : %s", "; ".join(errors))
+            return
+
+        checked_at = datetime.now(timezone.utc).isoformat()
+        if disk_cache.frame_digest(df) == meta.get('content_hash'):
+            # Territoire sans validateur HTTP, ou réponse identique : garder la version actuelle.
+            meta.update(checked_at=checked_at, validators=validators)
+            disk_cache.write_json(CITIES_SNAPSHOT, meta)
+            return
+
+        _write_cities_snapshot(df, validators, checked_at)
+        load_cities_data.clear()
+        _get_city_catalogue.clear()
+    except Exception:
+        logger.exception("Échec de la revalidation du catalogue des villes")
+
+
+def _schedule_cities_revalidation() -> None:
+    """
+    Lance la revalidation de l'instantané dans un thread dédié,
+    sauf si une revalidation est déjà en cours
+    """
+    global _cities_revalidation_thread
+    with _cities_revalidation_lock:
+        if _cities_revalidation_thread is not None and _cities_revalidation_thread.is_alive():
+            return
+        _cities_revalidation_thread = threading.Thread(
+            target=_revalidate_cities_snapshot,
+            name="cities-snapshot-revalidation",
+            daemon=True
+        )
+        _cities_revalidation_thread.start()
 
 
 @st.cache_data(ttl=3600)
@@ -169,265 +805,730 @@ def load_cities_data() -> pd.DataFrame:
     Charge les données des villes françaises > 20 000 habitants depuis OpenDataSoft
     Inclut la France métropolitaine et les DOM-TOM
     Agrège les arrondissements de Paris, Marseille et Lyon dans leurs villes principales
+    Sert l'instantané local s'il existe et le revalide en arrière-plan ;
+    sinon télécharge le catalogue (territoires en parallèle) et écrit l'instantané
+    Ajoute les colonnes de rang et de percentile (voir _add_rank_columns)
     """
-    all_rows = []
-    
     try:
-        # Interroger chaque territoire français pour couvrir métropole et outre-mer.
-        for country_code in FRANCE_TERRITORIES:
-            url = f"{CITIES_API_BASE_URL}&refine.country_code={country_code}"
+        df, meta = disk_cache.read_snapshot(CITIES_SNAPSHOT)
+        if df is not None and not df.empty:
+            df = _add_rank_columns(df)
+            df.attrs['catalogue_version'] = meta.get('fetched_at')
+            _schedule_cities_revalidation()
+            return df
+
+        df, validators, errors = _download_cities()
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        df.attrs['catalogue_version'] = fetched_at
+        for message in errors:
+            st.warning(message)
+
+        # N'enregistrer que des catalogues complets.
+        if not df.empty and not errors:
             try:
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                records = data.get('records', [])
-
-                for record in records:
-                    fields = record.get('fields', {})
-                    ville_name = fields.get('name')
-                    departement_code = fields.get('admin2_code')
-                    
-                    # Regrouper les arrondissements sous la ville principale.
-                    if ville_name and _is_arrondissement(ville_name):
-                        main_city = _extract_main_city_name(ville_name)
-                        if main_city:
-                            ville_name = main_city
-                    
-                    # Éviter les doublons d'arrondissements pour Paris.
-                    if departement_code == '75' and ville_name != 'Paris':
-                        continue
-                    
-                    # Désambiguïser les villes homonymes dans les listes de sélection.
-                    if ville_name and departement_code:
-                        ville_display = f"{ville_name} ({departement_code})"
-                    else:
-                        ville_display = ville_name
-                    
-                    coordinates = fields.get('coordinates', [None, None])
-                    lat = coordinates[0] if isinstance(coordinates, list) and len(coordinates) >= 2 else None
-                    lon = coordinates[1] if isinstance(coordinates, list) and len(coordinates) >= 2 else None
-
-                    all_rows.append({
-                        'ville': ville_display,
-                        'ville_nom': ville_name,
-                        'population': fields.get('population'),
-                        'region_code': fields.get('admin1_code'),
-                        'departement_code': departement_code,
-                        'pays': fields.get('country_code'),
-                        'timezone': fields.get('timezone'),
-                        'altitude': fields.get('dem'),
-                        'lat': lat,
-                        'lon': lon
-                    })
+                _write_cities_snapshot(df, validators, fetched_at)
             except Exception as e:
-                st.warning(f"Impossible de charger les données pour {country_code}: {e}")
-                continue
+                st.warning(f"Impossible d'enregistrer l'instantané des villes: {e}")
 
-        df = pd.DataFrame(all_rows)
-        
-            # Fusionner les arrondissements pour obtenir une ligne par grande ville.
-        if not df.empty:
-            agg_dict = {
-                'population': 'sum',
-                'lat': 'mean',
-                'lon': 'mean',
-                'altitude': 'mean',
-                'region_code': 'first',
-                'departement_code': 'first',
-                'pays': 'first',
-                'timezone': 'first',
-                'ville_nom': 'first'
-            }
-            df = df.groupby('ville', as_index=False).agg(agg_dict)
-        
-        return df
+        return _add_rank_columns(df)
     except Exception as e:
         st.error(f"Erreur lors du chargement des villes: {e}")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=3600)
+def _cached_insee_table(file_path: Path, cache_name: str, build) -> pd.DataFrame:
+    """
+    Retourne la table communale agrégée depuis le cache Feather (mappé en mémoire)
+    si elle correspond à l'empreinte du fichier source, sinon la reconstruit et l'enregistre.
+    Le fichier source n'est haché que si sa taille ou sa date de modification a changé.
+    L'empreinte est exposée dans df.attrs['source_hash'].
+    """
+    signature = disk_cache.file_signature(file_path)
+    df, meta = disk_cache.read_feather(cache_name)
+    if df is not None and meta.get('source_signature') == signature:
+        source_hash = meta.get('source_hash')
+    else:
+        source_hash = disk_cache.file_digest(file_path)
+
+    if (
+        df is None
+        or meta.get('source_hash') != source_hash
+        or meta.get('version') != INSEE_CACHE_VERSION
+    ):
+        df = build()
+        if not df.empty:
+            try:
+                disk_cache.write_feather(cache_name, df, {
+                    'version': INSEE_CACHE_VERSION,
+                    'source': file_path.name,
+                    'source_hash': source_hash,
+                    'source_signature': signature,
+                    'built_at': datetime.now(timezone.utc).isoformat(),
+                })
+            except Exception as e:
+                logger.warning("Impossible d'enregistrer le cache %s : %s", cache_name, e)
+    elif meta.get('source_signature') != signature:
+        # Fichier touché mais contenu identique : retenir la nouvelle signature pour ne plus le hacher.
+        try:
+            disk_cache.write_json(cache_name, {**meta, 'source_signature': signature})
+        except Exception as e:
+            logger.warning("Impossible d'enregistrer le cache %s : %s", cache_name, e)
+
+    df.attrs['source_hash'] = source_hash
+    return df
+
+
+def _count_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Retourne une colonne d'effectifs, ou des zéros si elle est absente du fichier
+    """
+    if column in df.columns:
+        return df[column]
+    return pd.Series(0.0, index=df.index)
+
+
+def _rate(numerator: pd.Series, denominator: pd.Series, scale: float = 100) -> pd.Series:
+    """
+    Taux vectorisé, nul lorsque le dénominateur est nul ou manquant
+    """
+    return (numerator / denominator * scale).where(denominator > 0, 0.0)
+
+
+def _add_emploi_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcule en un seul passage les indicateurs d'emploi et de formation de toutes les communes
+    Les indicateurs de formation portent sur les effectifs tronqués à l'entier, comme à l'affichage.
+    """
+    pop_15_64 = _count_column(df, EMPLOI_COUNT_COLUMNS['population_15_64'])
+    actifs = _count_column(df, EMPLOI_COUNT_COLUMNS['actifs'])
+    indicators = {
+        'taux_activite': _rate(actifs, pop_15_64),
+        'taux_chomage': _rate(_count_column(df, EMPLOI_COUNT_COLUMNS['chomeurs']), actifs),
+        'taux_emploi': _rate(_count_column(df, EMPLOI_COUNT_COLUMNS['actifs_occupes']), pop_15_64),
+        'part_inactifs': _rate(_count_column(df, EMPLOI_COUNT_COLUMNS['inactifs']), pop_15_64),
+    }
+
+    def _truncated(column: str) -> pd.Series:
+        return np.trunc(_count_column(df, column).fillna(0))
+
+    actifs_dipl = [_truncated(c) for c in ACTIFS_DIPLOME_COLUMNS]
+    for i, (actifs_niveau, chomeurs_col) in enumerate(zip(actifs_dipl, CHOMEURS_DIPLOME_COLUMNS)):
+        indicators[f'taux_chomage_dipl_{i}'] = _rate(_truncated(chomeurs_col), actifs_niveau)
+
+    pcs_values = [_truncated(c) for c in PCS_COLUMNS]
+    total_pcs = sum(pcs_values)
+    for i, pcs_value in enumerate(pcs_values):
+        indicators[f'pcs_pct_{i}'] = _rate(pcs_value, total_pcs)
+
+    total_actifs_dipl = sum(actifs_dipl)
+    indicators['part_superieur'] = _rate(sum(actifs_dipl[4:]), total_actifs_dipl)
+    indicators['part_sans_diplome'] = _rate(actifs_dipl[0], total_actifs_dipl)
+
+    return pd.concat([df, pd.DataFrame(indicators, index=df.index)], axis=1)
+
+
+def _add_logement_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcule en un seul passage les indicateurs de logement de toutes les communes
+    """
+    nb_logements = _count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_logements'])
+    nb_residences_principales = _count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_residences_principales'])
+    indicators = {
+        'taux_logements_vacants': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_logements_vacants']), nb_logements),
+        'taux_residence_secondaire': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_residences_secondaires']), nb_logements),
+        'taux_maisons': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_maisons']), nb_logements),
+        'taux_appartements': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nombre_appartements']), nb_logements),
+        'taux_proprietaires': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nb_proprietaires']), nb_residences_principales),
+        'taux_locataires': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nb_locataires']), nb_residences_principales),
+        'taux_hlm': _rate(_count_column(df, LOGEMENT_COUNT_COLUMNS['nb_hlm']), nb_residences_principales),
+        'pieces_moyennes': _rate(_count_column(df, 'Pièces rés princ en 2022 (princ)'), nb_residences_principales, scale=1),
+    }
+    return pd.concat([df, pd.DataFrame(indicators, index=df.index)], axis=1)
+
+
+def _aggregate_communes_emploi() -> pd.DataFrame:
+    """
+    Lit le fichier CSV INSEE emploi et agrège les données IRIS par commune
+    """
+    # Lire uniquement les colonnes utiles du fichier CSV (sans notion de feuilles)
+    df = _read_insee_csv(
+        EMPLOI_FILE,
+        required_columns=['Code géographique'],
+        label_columns=EMPLOI_LABEL_COLUMNS,
+        numeric_columns=EMPLOI_NUMERIC_COLUMNS
+    )
+    if df.empty:
+        st.warning(f"Impossible de lire le fichier d'emploi (format CSV invalide): {EMPLOI_FILE}")
+        return pd.DataFrame()
+    
+    # Filtrer la première ligne qui contient les codes de colonnes
+    df = df[df['Code géographique'].astype(str) != 'CODGEO']
+    
+    # Convertir les colonnes numériques
+    numeric_cols = EMPLOI_NUMERIC_COLUMNS
+    
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = _to_numeric_safe(df[col])
+    
+    # Agréger par commune (code commune)
+    agg_dict = {}
+    for col in numeric_cols:
+        if col in df.columns:
+            agg_dict[col] = 'sum'
+    
+    # Ajouter les colonnes de libellés (prendre le premier)
+    if 'Libellé géographique' in df.columns:
+        agg_dict['Libellé géographique'] = 'first'
+    if 'Département' in df.columns:
+        agg_dict['Département'] = 'first'
+    if 'Région' in df.columns:
+        agg_dict['Région'] = 'first'
+    
+    df_communes = df.groupby('Code géographique').agg(agg_dict).reset_index()
+    
+    # Table large : effectifs et indicateurs de chaque commune
+    return _add_emploi_indicators(df_communes)
+
+
+@st.cache_resource(ttl=3600)
 def load_communes_emploi_data() -> pd.DataFrame:
     """
     Charge les données d'emploi communales depuis le fichier CSV INSEE
-    Agrège les données IRIS par commune
+    Agrège les données IRIS par commune et calcule les indicateurs d'emploi et de formation
+    La table agrégée est relue depuis le cache local tant que le CSV n'a pas changé
+    Objet partagé en lecture seule entre les sessions (colonnes numériques mappées en mémoire).
     """
     try:
         if not EMPLOI_FILE.exists():
             st.warning(f"Fichier de données d'emploi introuvable: {EMPLOI_FILE}")
             return pd.DataFrame()
 
-        # Lire le fichier CSV (sans notion de feuilles)
-        df = _read_insee_csv(EMPLOI_FILE, required_columns=['Code géographique'])
-        if df.empty:
-            st.warning(f"Impossible de lire le fichier d'emploi (format CSV invalide): {EMPLOI_FILE}")
-            return pd.DataFrame()
-        
-        # Filtrer la première ligne qui contient les codes de colonnes
-        df = df[df['Code géographique'].astype(str) != 'CODGEO']
-        
-        # Convertir les colonnes numériques
-        numeric_cols = [
-            'Pop 15-64 ans en 2022 (princ)',
-            'Actifs 15-64 ans en 2022 (princ)',
-            'Actifs occupés 15-64 ans en 2022 (princ)',
-            'Chômeurs 15-64 ans en 2022 (princ)',
-            'Inactifs 15-64 ans en 2022 (princ)',
-            'Élèves, étudiants et stagiaires non rémunérés 15-64 ans en 2022 (princ)',
-            'Retraités ou préretraités 15-64 ans en 2022 (princ)',
-            'Autres inactifs 15-64 ans en 2022 (princ)',
-            # Diplômes des actifs
-            'Actifs Sans diplôme ou CEP en 2022 (princ)',
-            'Actifs BEPC, brevet des collèges, DNB en 2022 (princ)',
-            'Actifs CAP-BEP ou équiv. en 2022 (princ)',
-            'Actifs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-            # Diplômes des chômeurs
-            'Chômeurs Sans diplôme ou CEP en 2022 (princ)',
-            'Chômeurs BEPC, brevet des collèges, DNB en 2022 (princ)',
-            'Chômeurs CAP-BEP ou équiv. en 2022 (princ)',
-            'Chômeurs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-            # PCS (Professions et Catégories Socioprofessionnelles)
-            'Actifs 15-64 ans Agriculteurs exploitants en 2022 (compl)',
-            'Actifs 15-64 ans Artisans, Comm., Chefs entr. en 2022 (compl)',
-            'Actifs 15-64 ans Cadres, Prof. intel. sup. en 2022 (compl)',
-            'Actifs 15-64 ans Prof. intermédiaires en 2022 (compl)',
-            'Actifs 15-64 ans Employés en 2022 (compl)',
-            'Actifs 15-64 ans Ouvriers en 2022 (compl)',
-        ]
-        
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = _to_numeric_safe(df[col])
-        
-        # Agréger par commune (code commune)
-        agg_dict = {}
-        for col in numeric_cols:
-            if col in df.columns:
-                agg_dict[col] = 'sum'
-        
-        # Ajouter les colonnes de libellés (prendre le premier)
-        if 'Libellé géographique' in df.columns:
-            agg_dict['Libellé géographique'] = 'first'
-        if 'Département' in df.columns:
-            agg_dict['Département'] = 'first'
-        if 'Région' in df.columns:
-            agg_dict['Région'] = 'first'
-        
-        df_communes = df.groupby('Code géographique').agg(agg_dict).reset_index()
-        
-        return df_communes
+        return _cached_insee_table(EMPLOI_FILE, EMPLOI_CACHE, _aggregate_communes_emploi)
         
     except Exception as e:
         st.error(f"Erreur lors du chargement des données d'emploi: {e}")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=3600)
+def _aggregate_communes_logement() -> pd.DataFrame:
+    """
+    Lit le fichier CSV INSEE logement et agrège les données IRIS par commune
+    """
+    # Lire uniquement les colonnes utiles du fichier CSV (sans notion de feuilles)
+    df = _read_insee_csv(
+        LOGEMENT_FILE,
+        required_columns=['Commune ou ARM'],
+        label_columns=LOGEMENT_LABEL_COLUMNS,
+        numeric_columns=LOGEMENT_NUMERIC_COLUMNS
+    )
+    if df.empty:
+        st.warning(f"Impossible de lire le fichier logement (format CSV invalide): {LOGEMENT_FILE}")
+        return pd.DataFrame()
+    
+    # Filtrer la première ligne qui contient les codes de colonnes
+    if 'Iris' in df.columns:
+        df = df[df['Iris'].astype(str) != 'IRIS']
+    
+    # Convertir les colonnes numériques
+    numeric_cols = LOGEMENT_NUMERIC_COLUMNS
+    
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = _to_numeric_safe(df[col])
+    
+    # Agréger par commune (code commune = Commune ou ARM)
+    agg_dict = {}
+    for col in numeric_cols:
+        if col in df.columns:
+            agg_dict[col] = 'sum'
+    
+    # Ajouter les colonnes de libellés (prendre le premier)
+    agg_dict['Libellé commune ou ARM'] = 'first'
+    if 'Département' in df.columns:
+        agg_dict['Département'] = 'first'
+    
+    df_communes = df.groupby('Commune ou ARM').agg(agg_dict).reset_index()
+    df_communes.rename(columns={'Commune ou ARM': 'code_commune'}, inplace=True)
+    
+    # Table large : effectifs et indicateurs de chaque commune
+    return _add_logement_indicators(df_communes)
+
+
+@st.cache_resource(ttl=3600)
 def load_communes_logement_data() -> pd.DataFrame:
     """
     Charge les données de logement communales depuis le fichier CSV INSEE
-    Agrège les données IRIS par commune
+    Agrège les données IRIS par commune et calcule les indicateurs de logement
+    La table agrégée est relue depuis le cache local tant que le CSV n'a pas changé
+    Objet partagé en lecture seule entre les sessions (colonnes numériques mappées en mémoire).
     """
     try:
         if not LOGEMENT_FILE.exists():
             st.warning(f"Fichier de données de logement introuvable: {LOGEMENT_FILE}")
             return pd.DataFrame()
 
-        # Lire le fichier CSV (sans notion de feuilles)
-        df = _read_insee_csv(LOGEMENT_FILE, required_columns=['Commune ou ARM'])
-        if df.empty:
-            st.warning(f"Impossible de lire le fichier logement (format CSV invalide): {LOGEMENT_FILE}")
-            return pd.DataFrame()
-        
-        # Filtrer la première ligne qui contient les codes de colonnes
-        if 'Iris' in df.columns:
-            df = df[df['Iris'].astype(str) != 'IRIS']
-        
-        # Convertir les colonnes numériques
-        numeric_cols = [
-            'Logements en 2022 (princ)',
-            'Résidences principales en 2022 (princ)',
-            'Rés secondaires et logts occasionnels en 2022 (princ)',
-            'Logements vacants en 2022 (princ)',
-            'Maisons en 2022 (princ)',
-            'Appartements en 2022 (princ)',
-            'Rés princ 1 pièce en 2022 (princ)',
-            'Rés princ 2 pièces en 2022 (princ)',
-            'Rés princ 3 pièces en 2022 (princ)',
-            'Rés princ 4 pièces en 2022 (princ)',
-            'Rés princ 5 pièces ou plus en 2022 (princ)',
-            'Pièces rés princ en 2022 (princ)',
-            'Ménages en 2022 (princ)',
-            'Rés princ occupées Propriétaires en 2022 (princ)',
-            'Rés princ occupées Locataires en 2022 (princ)',
-            'Rés princ HLM louée vide en 2022 (princ)',
-            'Ménages au moins une voiture en 2022 (princ)',
-            'Ménages deux voitures ou plus en 2022 (princ)'
-        ]
-        
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = _to_numeric_safe(df[col])
-        
-        # Agréger par commune (code commune = Commune ou ARM)
-        agg_dict = {}
-        for col in numeric_cols:
-            if col in df.columns:
-                agg_dict[col] = 'sum'
-        
-        # Ajouter les colonnes de libellés (prendre le premier)
-        agg_dict['Libellé commune ou ARM'] = 'first'
-        if 'Département' in df.columns:
-            agg_dict['Département'] = 'first'
-        
-        df_communes = df.groupby('Commune ou ARM').agg(agg_dict).reset_index()
-        df_communes.rename(columns={'Commune ou ARM': 'code_commune'}, inplace=True)
-        
-        return df_communes
+        return _cached_insee_table(LOGEMENT_FILE, LOGEMENT_CACHE, _aggregate_communes_logement)
         
     except Exception as e:
         st.error(f"Erreur lors du chargement des données de logement: {e}")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=1800)
-def get_weather_current(city: str) -> Dict:
+# Recherche approchée des libellés INSEE (repli quand le libellé exact est introuvable)
+_LABEL_SEPARATOR_PATTERN = re.compile(r'[^a-z0-9]+')
+_LABEL_ABBREVIATIONS = {'st': 'saint', 'ste': 'sainte'}
+LABEL_FUZZY_MIN_SCORE = 0.6
+LABEL_FUZZY_MAX_CANDIDATES = 5
+
+
+def _fold_label(label: str) -> str:
     """
-    Récupère la météo actuelle pour une ville
-    Coordonnées via OpenDataSoft, météo via Open-Meteo
+    Normalise un libellé : minuscules, sans accents, tirets et apostrophes remplacés par des espaces
     """
-    try:
-        df_cities = load_cities_data()
-        if df_cities.empty or 'ville' not in df_cities.columns:
-            return _fallback_weather_current()
-
-        city_match = df_cities[df_cities['ville'].str.lower() == city.lower()]
-        if city_match.empty:
-            return _fallback_weather_current()
-
-        city_info = city_match.iloc[0]
-        lat = city_info.get('lat')
-        lon = city_info.get('lon')
-
-        if pd.isna(lat) or pd.isna(lon):
-            return _fallback_weather_current()
-
-        params = {
-            "latitude": float(lat),
-            "longitude": float(lon),
-            "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,pressure_msl,cloud_cover,wind_speed_10m,visibility,weather_code",
-            "timezone": "auto"
+    text = unicodedata.normalize('NFKD', str(label)).encode('ascii', 'ignore').decode('ascii').lower()
+    tokens = _LABEL_SEPARATOR_PATTERN.sub(' ', text).split()
+    return ' '.join(_LABEL_ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def _label_trigrams(folded: str) -> set:
+    """
+    Trigrammes de caractères d'un libellé normalisé (bordé d'espaces)
+    """
+    padded = f" {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _LabelIndex:
+    """
+    Index des libellés normalisés des communes d'un département :
+    table mot → communes et table trigramme → communes.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str]]):
+        self.codes = []
+        self.labels = []
+        self.trigram_sets = []
+        self.by_token: Dict[str, set] = {}
+        self.by_trigram: Dict[str, set] = {}
+        for position, (code, label) in enumerate(entries):
+            folded = _fold_label(label)
+            trigrams = _label_trigrams(folded)
+            self.codes.append(code)
+            self.labels.append(label)
+            self.trigram_sets.append(trigrams)
+            for token in folded.split():
+                self.by_token.setdefault(token, set()).add(position)
+            for trigram in trigrams:
+                self.by_trigram.setdefault(trigram, set()).add(position)
+
+    def search(self, name: str, limit: int = LABEL_FUZZY_MAX_CANDIDATES) -> List[Tuple[str, str, float]]:
+        """
+        Retourne les communes candidates (code, libellé, score) classées par pertinence :
+        d'abord les libellés contenant tous les mots du nom, puis les libellés proches
+        par trigrammes (score de Dice au moins égal à LABEL_FUZZY_MIN_SCORE)
+        """
+        folded = _fold_label(name)
+        tokens = folded.split()
+        if not tokens:
+            return []
+        trigrams = _label_trigrams(folded)
+
+        def _score(position: int) -> float:
+            other = self.trigram_sets[position]
+            return 2 * len(trigrams & other) / (len(trigrams) + len(other))
+
+        # Libellés contenant tous les mots (équivalent indexé de la recherche par sous-chaîne)
+        postings = [self.by_token.get(token, set()) for token in tokens]
+        containing = set.intersection(*postings) if all(postings) else set()
+        ranked = sorted(containing, key=lambda position: (-_score(position), position))
+
+        # Compléter par les libellés partageant le plus de trigrammes (fautes, accents, mots manquants)
+        if len(ranked) < limit:
+            shared: Dict[int, int] = {}
+            for trigram in trigrams:
+                for position in self.by_trigram.get(trigram, ()):
+                    shared[position] = shared.get(position, 0) + 1
+            similar = [
+                position for position in shared
+                if position not in containing and _score(position) >= LABEL_FUZZY_MIN_SCORE
+            ]
+            ranked += sorted(similar, key=lambda position: (-_score(position), position))
+
+        return [
+            (self.codes[position], self.labels[position], round(_score(position), 3))
+            for position in ranked[:limit]
+        ]
+
+
+def _build_commune_crosswalk(
+    df_cities: pd.DataFrame,
+    df_communes: pd.DataFrame,
+    code_column: str,
+    label_column: str
+) -> Tuple[Dict[str, Tuple[str, ...]], List[Dict]]:
+    """
+    Construit la correspondance ville du catalogue → code(s) commune INSEE
+    - Paris, Marseille, Lyon : codes de tous les arrondissements du département
+    - autres villes : libellé exact dans le département, sinon libellé exact ailleurs,
+      sinon meilleur candidat de l'index des libellés normalisés du département
+    Retourne aussi le rapport des villes résolues par ce repli ou restées sans correspondance.
+    """
+    codes = df_communes[code_column].astype(str)
+    raw_labels = df_communes[label_column].astype(str)
+    labels = raw_labels.str.lower()
+    if 'Département' in df_communes.columns:
+        departements = df_communes['Département'].astype(str)
+    else:
+        departements = pd.Series('', index=df_communes.index)
+
+    # Tables de hachage construites en un seul passage sur les communes
+    by_label_dept = {}
+    by_label = {}
+    by_dept = {}
+    for code, raw_label, label, departement in zip(codes, raw_labels, labels, departements):
+        by_label_dept.setdefault((label, departement), []).append(code)
+        by_label.setdefault(label, []).append(code)
+        by_dept.setdefault(departement, []).append((code, raw_label))
+
+    # Index des libellés construits à la demande, une fois par département
+    label_indexes: Dict[str, _LabelIndex] = {}
+
+    crosswalk = {}
+    report = []
+    for ville, ville_nom, departement_code in zip(
+        df_cities['ville'], df_cities['ville_nom'], df_cities['departement_code']
+    ):
+        if pd.isna(ville) or pd.isna(ville_nom):
+            continue
+        name = str(ville_nom).lower()
+        departement = str(departement_code)
+
+        if ville_nom in ['Paris', 'Marseille', 'Lyon']:
+            matched = [
+                code for code, raw_label in by_dept.get(departement, [])
+                if raw_label.lower().startswith(name)
+            ]
+        else:
+            matched = by_label_dept.get((name, departement)) or by_label.get(name)
+            if not matched:
+                if departement not in label_indexes:
+                    label_indexes[departement] = _LabelIndex(by_dept.get(departement, []))
+                candidates = label_indexes[departement].search(ville_nom)
+                matched = [candidates[0][0]] if candidates else None
+                report.append({
+                    'ville': ville,
+                    'departement': departement,
+                    'code_commune': candidates[0][0] if candidates else None,
+                    'libelle_insee': candidates[0][1] if candidates else None,
+                    'score': candidates[0][2] if candidates else None,
+                    'candidats': [label for _, label, _ in candidates],
+                })
+
+        if matched:
+            crosswalk[ville] = tuple(matched)
+    return crosswalk, report
+
+
+# Jeux de données INSEE communaux : chargeur, colonne de code, colonne de libellé,
+# colonnes d'effectifs et calcul des indicateurs
+_INSEE_DATASETS = {
+    'emploi': (
+        load_communes_emploi_data, 'Code géographique', 'Libellé géographique',
+        EMPLOI_NUMERIC_COLUMNS, _add_emploi_indicators
+    ),
+    'logement': (
+        load_communes_logement_data, 'code_commune', 'Libellé commune ou ARM',
+        LOGEMENT_NUMERIC_COLUMNS, _add_logement_indicators
+    ),
+}
+
+# Nombre maximal de résolutions ville → ligne INSEE gardées en mémoire
+COMMUNE_RESOLVER_MAX_ENTRIES = 2048
+
+
+@st.cache_resource(ttl=3600, max_entries=8)
+def _get_insee_dataset(dataset: str, catalogue_version: Optional[str]) -> Optional[Dict]:
+    """
+    Retourne la table communale indexée par code INSEE, la correspondance
+    ville → code(s) et son rapport de repli, construits une fois par version du catalogue.
+    Objet partagé en lecture seule entre les sessions.
+    """
+    loader, code_column, label_column, _, _ = _INSEE_DATASETS[dataset]
+    df_communes = loader()
+    df_cities = load_cities_data()
+    if df_communes.empty or df_cities.empty:
+        return None
+
+    crosswalk, match_report = _build_commune_crosswalk(df_cities, df_communes, code_column, label_column)
+    unmatched = sum(1 for entry in match_report if entry['code_commune'] is None)
+    if match_report:
+        logger.info(
+            "Correspondance INSEE %s : %d ville(s) par recherche approchée, %d sans correspondance",
+            dataset, len(match_report) - unmatched, unmatched
+        )
+
+    return {
+        'table': df_communes.set_index(code_column, drop=False),
+        'crosswalk': crosswalk,
+        'match_report': match_report,
+        'source_hash': df_communes.attrs.get('source_hash'),
+    }
+
+
+def _commune_row(
+    commune_data: pd.DataFrame,
+    ville_nom: str,
+    departement_code: str,
+    label_column: str,
+    code_column: str,
+    count_columns: List[str],
+    add_indicators
+) -> pd.Series:
+    """
+    Retourne la ligne d'indicateurs d'une commune.
+    Pour les arrondissements, somme les effectifs puis recalcule les indicateurs
+    avec le même calcul vectorisé que la table communale.
+    """
+    if len(commune_data) == 1:
+        return commune_data.iloc[0]
+
+    columns = [col for col in count_columns if col in commune_data.columns]
+    totals = add_indicators(commune_data[columns].sum().to_frame().T)
+    totals[label_column] = ville_nom
+    totals['Département'] = departement_code
+    totals[code_column] = commune_data.iloc[0][code_column]
+    return totals.iloc[0]
+
+
+def _resolve_commune(dataset: str, city: str) -> Optional[pd.Series]:
+    """
+    Résout une ville du catalogue en sa ligne d'indicateurs INSEE ('emploi' ou 'logement').
+    Partagé par tous les get_* : la correspondance, l'accès indexé et l'agrégation
+    des arrondissements ne sont faits qu'une fois par ville et par version des données.
+    La ligne retournée est partagée : ne pas la modifier.
+    """
+    catalogue = _get_city_catalogue()
+    if not catalogue['index']['exact']:
+        return None
+    catalogue_version = catalogue['version']
+    insee = _get_insee_dataset(dataset, catalogue_version)
+    if insee is None:
+        return None
+    return _resolve_commune_version(dataset, insee['source_hash'], catalogue_version, city)
+
+
+@functools.lru_cache(maxsize=COMMUNE_RESOLVER_MAX_ENTRIES)
+def _resolve_commune_version(
+    dataset: str,
+    source_hash: Optional[str],
+    catalogue_version: Optional[str],
+    city: str
+) -> Optional[pd.Series]:
+    """
+    Résolution mémoïsée : la clé inclut l'empreinte du CSV et la version du catalogue,
+    une nouvelle version des données ne réutilise donc jamais une ancienne ligne
+    """
+    insee = _get_insee_dataset(dataset, catalogue_version)
+    codes = insee['crosswalk'].get(city) if insee is not None else None
+    if not codes:
+        return None
+
+    _, code_column, label_column, count_columns, add_indicators = _INSEE_DATASETS[dataset]
+    city_entry = _get_city_catalogue()['index']['exact'].get(city)
+    if city_entry is None:
+        return None
+    return _commune_row(
+        insee['table'].loc[list(codes)],
+        city_entry['ville_nom'], city_entry['departement_code'],
+        label_column, code_column, count_columns, add_indicators
+    )
+
+
+def _resolve_communes_many(dataset: str, cities: List[str]) -> pd.DataFrame:
+    """
+    Équivalent vectorisé de _resolve_commune pour une liste de villes : une jointure
+    ville → codes INSEE → table d'indicateurs, puis une agrégation groupée des arrondissements.
+    Retourne une ligne par ville trouvée, indexée par ville dans l'ordre demandé,
+    avec le nom et le département du catalogue (ville_nom, departement_code).
+    """
+    df_cities = load_cities_data()
+    if df_cities.empty:
+        return pd.DataFrame()
+    insee = _get_insee_dataset(dataset, df_cities.attrs.get('catalogue_version'))
+    if insee is None:
+        return pd.DataFrame()
+    _, code_column, label_column, count_columns, add_indicators = _INSEE_DATASETS[dataset]
+
+    requested = list(dict.fromkeys(cities))
+    links = [(city, code) for city in requested for code in insee['crosswalk'].get(city, ())]
+    if not links:
+        return pd.DataFrame()
+    villes, codes = zip(*links)
+    rows = insee['table'].loc[list(codes)].reset_index(drop=True)
+    rows.index = pd.Index(villes, name='ville')
+
+    # Villes à arrondissements : sommer les effectifs puis recalculer les indicateurs
+    multiple = rows.index.duplicated(keep=False)
+    resolved = rows[~multiple]
+    if multiple.any():
+        grouped = rows[multiple].groupby(level='ville', sort=False)
+        columns = [col for col in count_columns if col in rows.columns]
+        totals = add_indicators(grouped[columns].sum())
+        totals[code_column] = grouped[code_column].first()
+        resolved = pd.concat([resolved, totals])
+
+    catalogue = df_cities.drop_duplicates('ville').set_index('ville')
+    resolved = resolved.reindex([city for city in requested if city in resolved.index])
+    resolved['ville_nom'] = catalogue['ville_nom'].reindex(resolved.index)
+    resolved['departement_code'] = catalogue['departement_code'].reindex(resolved.index)
+    # Libellé de la ville principale pour les lignes agrégées
+    resolved[label_column] = resolved[label_column].fillna(resolved['ville_nom'])
+    return resolved
+
+
+def _build_city_index(df_cities: pd.DataFrame) -> Dict[str, Dict]:
+    exact = {}
+    lowered = {}
+    for position, (ville, ville_nom, departement_code, lat, lon) in enumerate(zip(
+        df_cities['ville'], df_cities['ville_nom'], df_cities['departement_code'],
+        df_cities['lat'], df_cities['lon']
+    )):
+        if pd.isna(ville):
+            continue
+        entry = {
+            'position': position, 'ville': ville, 'ville_nom': ville_nom,
+            'departement_code': departement_code, 'lat': lat, 'lon': lon
         }
-        response = requests.get(OPEN_METEO_URL, params=params, timeout=10)
-        response.raise_for_status()
+        exact.setdefault(ville, entry)
+        lowered.setdefault(ville.lower(), entry)
+    return {'exact': exact, 'lower': lowered}
+
+
+def _get_city_index(df_cities: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Retourne les tables de hachage des villes : nom affiché exact et nom en minuscules
+    vers la position de la ligne, le nom, le département et les coordonnées.
+    L'index est construit une seule fois par version du catalogue
+    (une fois par DataFrame pour un catalogue sans version).
+    """
+    version = df_cities.attrs.get('catalogue_version')
+    with _city_index_lock:
+        if version is not None:
+            index = _city_indexes.get(version)
+        else:
+            ref, index = _unversioned_city_indexes.get(id(df_cities), (None, None))
+            if ref is None or ref() is not df_cities:
+                index = None
+        if index is not None:
+            return index
+
+        index = _build_city_index(df_cities)
+        # Ne conserver que les index des derniers catalogues.
+        if version is not None:
+            while len(_city_indexes) >= _CITY_INDEX_MAX_VERSIONS:
+                _city_indexes.pop(next(iter(_city_indexes)))
+            _city_indexes[version] = index
+        else:
+            while len(_unversioned_city_indexes) >= _CITY_INDEX_MAX_VERSIONS:
+                _unversioned_city_indexes.pop(next(iter(_unversioned_city_indexes)))
+            _unversioned_city_indexes[id(df_cities)] = (weakref.ref(df_cities), index)
+        return index
 
-        current = response.json().get('current', {})
+
+@st.cache_resource(ttl=3600)
+def _get_city_catalogue() -> Dict:
+    """
+    Version et index du catalogue partagés entre les sessions et les threads :
+    les recherches par ville (coordonnées, résolution INSEE) n'ont pas à recopier
+    le catalogue depuis st.cache_data à chaque appel. Invalidé avec load_cities_data.
+    """
+    df_cities = load_cities_data()
+    if df_cities.empty or 'ville' not in df_cities.columns:
+        return {'version': None, 'index': {'exact': {}, 'lower': {}}}
+    return {'version': df_cities.attrs.get('catalogue_version'), 'index': _get_city_index(df_cities)}
+
+
+def _lookup_city(df_cities: pd.DataFrame, city: str, ignore_case: bool = False) -> Optional[Dict]:
+    """
+    Recherche une ville en O(1) dans l'index du catalogue
+    """
+    if df_cities.empty or 'ville' not in df_cities.columns or not city:
+        return None
+    index = _get_city_index(df_cities)
+    if ignore_case:
+        return index['lower'].get(city.lower())
+    return index['exact'].get(city)
+
+
+def _city_coordinates(city: str) -> Optional[Tuple[float, float]]:
+    """
+    Retourne (latitude, longitude) d'une ville du catalogue, ou None
+    """
+    city_entry = _get_city_catalogue()['index']['lower'].get(city.lower()) if city else None
+    if city_entry is None or pd.isna(city_entry['lat']) or pd.isna(city_entry['lon']):
+        return None
+    return float(city_entry['lat']), float(city_entry['lon'])
+
+
+def _fetch_weather_bundle(city: str) -> Dict:
+    """
+    Récupère en un seul appel Open-Meteo la météo actuelle et les prévisions d'une ville
+    (lève une exception si l'appel échoue)
+    """
+    coordinates = _city_coordinates(city)
+    if coordinates is None:
+        return {'current': None, 'forecast': []}
+    lat, lon = coordinates
+
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "current": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,pressure_msl,cloud_cover,wind_speed_10m,visibility,weather_code",
+        "daily": "weather_code,temperature_2m_max,temperature_2m_min",
+        "forecast_days": 3,
+        "timezone": "auto"
+    }
+    response = http_client.get(OPEN_METEO_URL, params=params, timeout=10)
+    response.raise_for_status()
+    payload = response.json()
+
+    return {
+        'current': _parse_weather_current(payload.get('current', {})),
+        'forecast': _parse_weather_forecast(payload.get('daily', {}))
+    }
+
+
+# Météo par ville : actualisée en arrière-plan avant expiration pour les villes consultées récemment
+_weather_cache = swr_cache.RefreshingCache(
+    "météo",
+    _fetch_weather_bundle,
+    ttl=WEATHER_TTL,
+    refresh_ahead=WEATHER_REFRESH_AHEAD,
+    keep_for=WEATHER_KEEP_FOR,
+    max_entries=WEATHER_MAX_CITIES
+)
+
+
+def _get_weather_bundle(city: str) -> Dict:
+    """
+    Météo actuelle et prévisions d'une ville, servies depuis le cache partagé :
+    un seul résultat par ville sert get_weather_current et get_weather_forecast.
+    Seule la première demande d'une ville attend Open-Meteo ; ensuite la dernière valeur
+    est servie (marquée périmée après expiration) pendant son actualisation.
+    """
+    try:
+        bundle, stale, fetched_at = _weather_cache.get(city)
+    except Exception:
+        return {'current': None, 'forecast': [], 'stale': False, 'fetched_at': None}
+    return dict(copy.deepcopy(bundle), stale=stale, fetched_at=fetched_at)
+
+
+def _parse_weather_current(current: Dict) -> Optional[Dict]:
+    """
+    Met en forme le bloc « current » d'Open-Meteo, ou None s'il est illisible
+    """
+    try:
         weather_code = current.get('weather_code')
 
         return {
@@ -443,50 +1544,23 @@ def get_weather_current(city: str) -> Dict:
             }]
         }
     except Exception:
-        return _fallback_weather_current()
+        return None
 
 
-@st.cache_data(ttl=1800)
-def get_weather_forecast(city: str) -> List[Dict]:
+def _parse_weather_forecast(daily: Dict) -> List[Dict]:
     """
-    Récupère les prévisions météo pour une ville
+    Met en forme le bloc « daily » d'Open-Meteo (une entrée par jour)
     """
     try:
-        df_cities = load_cities_data()
-        if df_cities.empty or 'ville' not in df_cities.columns:
-            return []
-
-        city_match = df_cities[df_cities['ville'].str.lower() == city.lower()]
-        if city_match.empty:
-            return []
-
-        city_info = city_match.iloc[0]
-        lat = city_info.get('lat')
-        lon = city_info.get('lon')
-
-        if pd.isna(lat) or pd.isna(lon):
-            return []
-
-        params = {
-            "latitude": float(lat),
-            "longitude": float(lon),
-            "daily": "weather_code,temperature_2m_max,temperature_2m_min",
-            "forecast_days": 3,
-            "timezone": "auto"
-        }
-        response = requests.get(OPEN_METEO_URL, params=params, timeout=10)
-        response.raise_for_status()
-
-        daily = response.json().get('daily', {})
         dates = daily.get('time', [])
         max_temps = daily.get('temperature_2m_max', [])
         min_temps = daily.get('temperature_2m_min', [])
         weather_codes = daily.get('weather_code', [])
 
         forecast = []
-        for date, max_temp, min_temp, code in zip(dates, max_temps, min_temps, weather_codes):
+        for day, max_temp, min_temp, code in zip(dates, max_temps, min_temps, weather_codes):
             forecast.append({
-                'date': date,
+                'date': day,
                 'maxtempC': str(round(max_temp)) if max_temp is not None else 'N/A',
                 'mintempC': str(round(min_temp)) if min_temp is not None else 'N/A',
                 'hourly': [{
@@ -499,65 +1573,195 @@ def get_weather_forecast(city: str) -> List[Dict]:
         return []
 
 
+def get_weather_current(city: str) -> Dict:
+    """
+    Récupère la météo actuelle pour une ville
+    Coordonnées via OpenDataSoft, météo via Open-Meteo
+    """
+    bundle = _get_weather_bundle(city)
+    if bundle['current'] is None:
+        return _fallback_weather_current()
+    # stale : valeur expirée servie pendant son actualisation ; updated_at : heure de la récupération
+    return dict(
+        bundle['current'],
+        stale=bundle['stale'],
+        updated_at=datetime.fromtimestamp(bundle['fetched_at'], timezone.utc)
+    )
+
+
+def get_weather_forecast(city: str) -> List[Dict]:
+    """
+    Récupère les prévisions météo pour une ville
+    """
+    return _get_weather_bundle(city)['forecast']
+
+
+def _fetch_archive_daily(lat: float, lon: float, start: date, end: date) -> List[weather_store.DailyWeather]:
+    """
+    Récupère la météo journalière (date, max, min, précipitations) de l'archive Open-Meteo entre deux dates
+    """
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start.strftime("%Y-%m-%d"),
+        "end_date": end.strftime("%Y-%m-%d"),
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
+        "timezone": "auto"
+    }
+
+    response = http_client.get(OPEN_METEO_ARCHIVE_URL, params=params, timeout=10)
+    response.raise_for_status()
+
+    daily = response.json().get('daily', {})
+    days = daily.get('time', [])
+    return [
+        (date.fromisoformat(day), max_temp, min_temp, precipitation)
+        for day, max_temp, min_temp, precipitation in zip(
+            days,
+            daily.get('temperature_2m_max', []),
+            daily.get('temperature_2m_min', []),
+            daily.get('precipitation_sum', [None] * len(days))
+        )
+    ]
+
+
+def ingest_weather_history(city: str, start: date, end: date) -> int:
+    """
+    Complète l'historique local d'une ville sur une période : une requête d'archive
+    couvrant les jours absents ou provisoires, puis enregistrement.
+    Retourne le nombre de jours demandés.
+    """
+    coordinates = _city_coordinates(city)
+    if coordinates is None:
+        return 0
+
+    today = date.today()
+    missing = weather_store.missing_dates(city, start, min(end, today), today)
+    if not missing:
+        return 0
+    days = _fetch_archive_daily(*coordinates, missing[0], missing[-1])
+    weather_store.record_daily_weather(city, days, today)
+    return len(days)
+
+
 @st.cache_data(ttl=3600)
 def get_annual_temperature_average(city: str) -> Optional[float]:
     """
     Récupère la température moyenne annuelle depuis le début de l'année en cours
-    Utilise l'API Open-Meteo Archive
+    Utilise l'API Open-Meteo Archive : seuls les jours absents de l'historique local
+    (utils/weather_store.py) sont demandés, au plus une fois par jour et par ville
     """
     try:
-        from datetime import date
-        
-        df_cities = load_cities_data()
-        if df_cities.empty or 'ville' not in df_cities.columns:
+        coordinates = _city_coordinates(city)
+        if coordinates is None:
             return None
+        lat, lon = coordinates
 
-        city_match = df_cities[df_cities['ville'].str.lower() == city.lower()]
-        if city_match.empty:
+        today = date.today()
+        current_year = today.year
+        try:
+            sync = weather_store.get_temperature_sync(city, current_year)
+            if sync['checked_on'] != today:
+                start = sync['synced_through'] + timedelta(days=1)
+                days = _fetch_archive_daily(lat, lon, start, today) if start <= today else []
+                weather_store.record_daily_weather(city, days, today)
+            avg_temp = weather_store.year_to_date_mean(city, current_year, today)
+        except requests.RequestException:
+            # Archive injoignable (RequestException hérite d'OSError) : pas de second téléchargement.
             return None
+        except (sqlite3.Error, OSError) as e:
+            # Historique local indisponible : téléchargement complet depuis le 1er janvier.
+            logger.warning("Historique météo local indisponible (%s), téléchargement complet", e)
+            days = _fetch_archive_daily(lat, lon, date(current_year, 1, 1), today)
+            all_temps = [t for _, max_temp, min_temp, _ in days for t in (max_temp, min_temp) if t is not None]
+            avg_temp = sum(all_temps) / len(all_temps) if all_temps else None
 
-        city_info = city_match.iloc[0]
-        lat = city_info.get('lat')
-        lon = city_info.get('lon')
+        return round(avg_temp, 1) if avg_temp is not None else None
 
-        if pd.isna(lat) or pd.isna(lon):
-            return None
+    except Exception:
+        return None
 
-        # Récupérer les données du 01/01 de l'année courante à aujourd'hui
-        today = date.today()
-        current_year = today.year
-        start_date = f"{current_year}-01-01"
-        end_date = today.strftime("%Y-%m-%d")
-
-        params = {
-            "latitude": float(lat),
-            "longitude": float(lon),
-            "start_date": start_date,
-            "end_date": end_date,
-            "daily": "temperature_2m_max,temperature_2m_min",
-            "timezone": "auto"
-        }
-        
-        response = requests.get("https://archive-api.open-meteo.com/v1/archive", params=params, timeout=10)
-        response.raise_for_status()
 
-        daily = response.json().get('daily', {})
-        max_temps = daily.get('temperature_2m_max', [])
-        min_temps = daily.get('temperature_2m_min', [])
+@st.cache_data(ttl=3600)
+def get_weather_history(city: str, start: date, end: date) -> pd.DataFrame:
+    """
+    Historique météo journalier d'une ville (date, tmax, tmin, precipitation) lu dans l'historique local,
+    complété au besoin par une requête d'archive pour les jours manquants
+    """
+    try:
+        ingest_weather_history(city, start, end)
+    except Exception as e:
+        logger.warning("Impossible de compléter l'historique météo de %s : %s", city, e)
+    try:
+        return weather_store.query_daily_weather(city, start, end)
+    except (sqlite3.Error, OSError):
+        return pd.DataFrame(columns=['date', 'tmax', 'tmin', 'precipitation'])
 
-        if not max_temps or not min_temps:
-            return None
 
-        # Calculer la moyenne annuelle
-        all_temps = [t for t in max_temps + min_temps if t is not None]
-        if not all_temps:
-            return None
+def _fetch_weather_current_chunk(chunk: pd.DataFrame) -> List[Dict]:
+    """
+    Récupère en une requête la météo actuelle d'un groupe de villes (listes de coordonnées)
+    """
+    params = {
+        "latitude": ",".join(f"{lat:.4f}" for lat in chunk['lat']),
+        "longitude": ",".join(f"{lon:.4f}" for lon in chunk['lon']),
+        "current": OPEN_METEO_CURRENT_VARIABLES,
+        "timezone": "auto"
+    }
+    response = http_client.get(OPEN_METEO_URL, params=params, timeout=20)
+    response.raise_for_status()
+    payload = response.json()
+    # Une seule coordonnée : l'API répond par un objet et non par une liste.
+    locations = payload if isinstance(payload, list) else [payload]
+    if len(locations) != len(chunk):
+        raise ValueError(f"{len(locations)} réponses pour {len(chunk)} coordonnées")
+    return [location.get('current', {}) for location in locations]
 
-        avg_temp = sum(all_temps) / len(all_temps)
-        return round(avg_temp, 1)
 
-    except Exception:
-        return None
+@st.cache_data(ttl=1800)
+def get_weather_current_all() -> pd.DataFrame:
+    """
+    Récupère la météo actuelle de toutes les villes du catalogue en quelques requêtes groupées
+    Retourne un tableau (ville, lat, lon, température, ressenti, humidité, vent, précipitations, conditions) ;
+    les valeurs restent vides pour les villes d'un groupe en échec
+    """
+    columns = ['ville', 'lat', 'lon', 'temperature', 'ressenti', 'humidite', 'vent', 'precipitations', 'weather_code', 'conditions']
+    df_cities = load_cities_data()
+    if df_cities.empty:
+        return pd.DataFrame(columns=columns)
+
+    locations = df_cities[['ville', 'lat', 'lon']].dropna().drop_duplicates('ville').reset_index(drop=True)
+    chunks = [
+        locations.iloc[start:start + OPEN_METEO_BATCH_SIZE]
+        for start in range(0, len(locations), OPEN_METEO_BATCH_SIZE)
+    ]
+
+    currents: List[Dict] = [{}] * len(locations)
+    with ThreadPoolExecutor(max_workers=OPEN_METEO_BATCH_WORKERS) as executor:
+        futures = {executor.submit(_fetch_weather_current_chunk, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                currents[chunk.index[0]:chunk.index[-1] + 1] = future.result()
+            except Exception as e:
+                logger.warning("Météo groupée indisponible pour %d villes : %s", len(chunk), e)
+
+    current = pd.DataFrame.from_records(currents, index=locations.index).reindex(columns=[
+        'temperature_2m', 'apparent_temperature', 'relative_humidity_2m',
+        'wind_speed_10m', 'precipitation', 'weather_code'
+    ])
+    weather = locations.assign(
+        temperature=pd.to_numeric(current['temperature_2m'], errors='coerce'),
+        ressenti=pd.to_numeric(current['apparent_temperature'], errors='coerce'),
+        humidite=pd.to_numeric(current['relative_humidity_2m'], errors='coerce'),
+        vent=pd.to_numeric(current['wind_speed_10m'], errors='coerce'),
+        precipitations=pd.to_numeric(current['precipitation'], errors='coerce'),
+        weather_code=pd.to_numeric(current['weather_code'], errors='coerce').astype('Int64'),
+    )
+    weather['conditions'] = [
+        _weather_code_to_label(None if pd.isna(code) else int(code)) for code in weather['weather_code']
+    ]
+    return weather[columns]
 
 
 def get_employment_data(city: str, ville_nom: str, departement_code: str) -> Optional[Dict]:
@@ -566,114 +1770,23 @@ def get_employment_data(city: str, ville_nom: str, departement_code: str) -> Opt
     Agrège les données des arrondissements pour Paris, Marseille et Lyon
     """
     try:
-        df_emploi = load_communes_emploi_data()
-        if df_emploi.empty:
-            return None
-        
-        df_cities = load_cities_data()
-        if df_cities.empty:
-            return None
-        
-        # Trouver le code commune depuis les données de villes
-        city_info = df_cities[df_cities['ville'] == city]
-        if city_info.empty:
+        # Ligne d'indicateurs résolue une seule fois par ville (agrégée pour les arrondissements)
+        row = _resolve_commune('emploi', city)
+        if row is None:
             return None
+        counts = {key: row.get(col, 0) for key, col in EMPLOI_COUNT_COLUMNS.items()}
         
-        # Pour Paris, Marseille, Lyon : chercher tous les arrondissements
-        if ville_nom in ['Paris', 'Marseille', 'Lyon']:
-            # Chercher toutes les communes dont le code commence par le code du département
-            # et dont le libellé contient le nom de la ville
-            commune_data = df_emploi[
-                (df_emploi['Département'] == departement_code) &
-                (df_emploi['Libellé géographique'].str.contains(
-                    f'^{ville_nom}', 
-                    case=False, 
-                    regex=True, 
-                    na=False
-                ))
-            ]
-        else:
-            # Pour les autres villes, chercher par nom exact
-            commune_data = df_emploi[
-                df_emploi['Libellé géographique'].str.lower() == ville_nom.lower()
-            ]
-            
-            # Si pas trouvé par nom, essayer avec le code département
-            if commune_data.empty:
-                communes_dept = df_emploi[df_emploi['Département'] == departement_code]
-                if not communes_dept.empty:
-                    for idx, row in communes_dept.iterrows():
-                        if ville_nom.lower() in str(row['Libellé géographique']).lower():
-                            commune_data = communes_dept[communes_dept.index == idx]
-                            break
-        
-        if commune_data.empty:
-            return None
-        
-        # Si plusieurs résultats (arrondissements), agréger
-        if len(commune_data) > 1:
-            # Sommer toutes les colonnes numériques
-            numeric_cols = [
-                'Pop 15-64 ans en 2022 (princ)',
-                'Actifs 15-64 ans en 2022 (princ)',
-                'Actifs occupés 15-64 ans en 2022 (princ)',
-                'Chômeurs 15-64 ans en 2022 (princ)',
-                'Inactifs 15-64 ans en 2022 (princ)',
-                'Élèves, étudiants et stagiaires non rémunérés 15-64 ans en 2022 (princ)',
-                'Retraités ou préretraités 15-64 ans en 2022 (princ)',
-                'Autres inactifs 15-64 ans en 2022 (princ)'
-            ]
-            
-            # Créer une ligne agrégée
-            aggregated = {}
-            for col in numeric_cols:
-                if col in commune_data.columns:
-                    aggregated[col] = commune_data[col].sum()
-            
-            # Ajouter les colonnes non-numériques
-            aggregated['Libellé géographique'] = ville_nom
-            aggregated['Département'] = departement_code
-            aggregated['Code géographique'] = commune_data.iloc[0]['Code géographique']
-            
-            # Créer un Series pour traitement uniforme
-            row = pd.Series(aggregated)
-        else:
-            row = commune_data.iloc[0]
-        
-        # Extraire les données
-        pop_15_64 = row.get('Pop 15-64 ans en 2022 (princ)', 0)
-        actifs = row.get('Actifs 15-64 ans en 2022 (princ)', 0)
-        actifs_occupes = row.get('Actifs occupés 15-64 ans en 2022 (princ)', 0)
-        chomeurs = row.get('Chômeurs 15-64 ans en 2022 (princ)', 0)
-        inactifs = row.get('Inactifs 15-64 ans en 2022 (princ)', 0)
-        etudiants = row.get('Élèves, étudiants et stagiaires non rémunérés 15-64 ans en 2022 (princ)', 0)
-        retraites = row.get('Retraités ou préretraités 15-64 ans en 2022 (princ)', 0)
-        autres_inactifs = row.get('Autres inactifs 15-64 ans en 2022 (princ)', 0)
-        
-        # Calculer les taux
-        taux_activite = (actifs / pop_15_64 * 100) if pop_15_64 > 0 else 0
-        taux_chomage = (chomeurs / actifs * 100) if actifs > 0 else 0
-        taux_emploi = (actifs_occupes / pop_15_64 * 100) if pop_15_64 > 0 else 0
-        part_inactifs = (inactifs / pop_15_64 * 100) if pop_15_64 > 0 else 0
-        
-        return {
+        result = {
             'commune': row.get('Libellé géographique', ville_nom),
             'code_commune': row.get('Code géographique', 'N/A'),
             'departement': departement_code,
             'annee': 2022,
-            'population_15_64': int(pop_15_64) if pd.notna(pop_15_64) else 'N/A',
-            'actifs': int(actifs) if pd.notna(actifs) else 'N/A',
-            'actifs_occupes': int(actifs_occupes) if pd.notna(actifs_occupes) else 'N/A',
-            'chomeurs': int(chomeurs) if pd.notna(chomeurs) else 'N/A',
-            'inactifs': int(inactifs) if pd.notna(inactifs) else 'N/A',
-            'etudiants': int(etudiants) if pd.notna(etudiants) else 'N/A',
-            'retraites': int(retraites) if pd.notna(retraites) else 'N/A',
-            'autres_inactifs': int(autres_inactifs) if pd.notna(autres_inactifs) else 'N/A',
-            'taux_activite': round(taux_activite, 1) if taux_activite else 0,
-            'taux_chomage': round(taux_chomage, 1) if taux_chomage else 0,
-            'taux_emploi': round(taux_emploi, 1) if taux_emploi else 0,
-            'part_inactifs': round(part_inactifs, 1) if part_inactifs else 0
         }
+        for key, value in counts.items():
+            result[key] = int(value) if pd.notna(value) else 'N/A'
+        for key in ['taux_activite', 'taux_chomage', 'taux_emploi', 'part_inactifs']:
+            result[key] = round(row[key], 1) if row[key] else 0
+        return result
     except Exception as e:
         st.warning(f"Erreur lors de la récupération des données d'emploi pour {ville_nom}: {e}")
         return None
@@ -685,130 +1798,41 @@ def get_housing_data(city: str, ville_nom: str, departement_code: str) -> Option
     Agrège les données des arrondissements pour Paris, Marseille et Lyon
     """
     try:
-        df_logements = load_communes_logement_data()
-        if df_logements.empty:
-            return None
-        
-        df_cities = load_cities_data()
-        if df_cities.empty:
-            return None
-        
-        # Trouver le code commune depuis les données de villes
-        city_info = df_cities[df_cities['ville'] == city]
-        if city_info.empty:
-            return None
-        
-        # Pour Paris, Marseille, Lyon : chercher tous les arrondissements
-        if ville_nom in ['Paris', 'Marseille', 'Lyon']:
-            # Chercher toutes les communes dont le nom commence par la ville
-            # Ex: "Paris 1er Arrondissement", "Paris", "Marseille 01", etc.
-            commune_data = df_logements[
-                df_logements['Libellé commune ou ARM'].str.contains(
-                    f'^{ville_nom}', 
-                    case=False, 
-                    regex=True, 
-                    na=False
-                )
-            ]
-        else:
-            # Pour les autres villes, chercher par nom exact
-            commune_data = df_logements[
-                df_logements['Libellé commune ou ARM'].str.lower() == ville_nom.lower()
-            ]
-            
-            # Si pas trouvé par nom, essayer avec le code département
-            if commune_data.empty:
-                # Chercher toutes les communes du département et trouver la meilleure correspondance
-                communes_dept = df_logements[df_logements['Département'] == departement_code]
-                if not communes_dept.empty:
-                    # Chercher la commune la plus proche par nom
-                    for idx, row in communes_dept.iterrows():
-                        if ville_nom.lower() in str(row['Libellé commune ou ARM']).lower():
-                            commune_data = communes_dept[communes_dept.index == idx]
-                            break
-        
-        if commune_data.empty:
+        # Ligne d'indicateurs résolue une seule fois par ville (agrégée pour les arrondissements)
+        row = _resolve_commune('logement', city)
+        if row is None:
             return None
+        counts = {key: row.get(col, 0) for key, col in LOGEMENT_COUNT_COLUMNS.items()}
         
-        # Si plusieurs résultats (arrondissements), agréger
-        if len(commune_data) > 1:
-            # Sommer toutes les colonnes numériques
-            numeric_cols = [
-                'Logements en 2022 (princ)',
-                'Résidences principales en 2022 (princ)',
-                'Rés secondaires et logts occasionnels en 2022 (princ)',
-                'Logements vacants en 2022 (princ)',
-                'Maisons en 2022 (princ)',
-                'Appartements en 2022 (princ)',
-                'Pièces rés princ en 2022 (princ)',
-                'Ménages en 2022 (princ)',
-                'Rés princ occupées Propriétaires en 2022 (princ)',
-                'Rés princ occupées Locataires en 2022 (princ)',
-                'Rés princ HLM louée vide en 2022 (princ)'
-            ]
-            
-            # Créer une ligne agrégée
-            aggregated = {}
-            for col in numeric_cols:
-                if col in commune_data.columns:
-                    aggregated[col] = commune_data[col].sum()
-            
-            # Ajouter les colonnes non-numériques
-            aggregated['Libellé commune ou ARM'] = ville_nom
-            aggregated['Département'] = departement_code
-            aggregated['code_commune'] = commune_data.iloc[0]['code_commune']
-            
-            # Créer un Series pour traitement uniforme
-            row = pd.Series(aggregated)
-        else:
-            row = commune_data.iloc[0]
-        
-        # Extraire les données
-        nb_logements = row.get('Logements en 2022 (princ)', 0)
-        nb_residences_principales = row.get('Résidences principales en 2022 (princ)', 0)
-        nb_secondaires = row.get('Rés secondaires et logts occasionnels en 2022 (princ)', 0)
-        nb_vacants = row.get('Logements vacants en 2022 (princ)', 0)
-        nb_maisons = row.get('Maisons en 2022 (princ)', 0)
-        nb_appartements = row.get('Appartements en 2022 (princ)', 0)
-        nb_pieces_total = row.get('Pièces rés princ en 2022 (princ)', 0)
-        nb_proprietaires = row.get('Rés princ occupées Propriétaires en 2022 (princ)', 0)
-        nb_locataires = row.get('Rés princ occupées Locataires en 2022 (princ)', 0)
-        nb_hlm = row.get('Rés princ HLM louée vide en 2022 (princ)', 0)
-        nb_menages = row.get('Ménages en 2022 (princ)', 0)
+        def _count(key):
+            return int(counts[key]) if pd.notna(counts[key]) else 'N/A'
         
-        # Calculer les taux
-        taux_vacants = (nb_vacants / nb_logements * 100) if nb_logements > 0 else 0
-        taux_secondaires = (nb_secondaires / nb_logements * 100) if nb_logements > 0 else 0
-        taux_maisons = (nb_maisons / nb_logements * 100) if nb_logements > 0 else 0
-        taux_appartements = (nb_appartements / nb_logements * 100) if nb_logements > 0 else 0
-        taux_proprietaires = (nb_proprietaires / nb_residences_principales * 100) if nb_residences_principales > 0 else 0
-        taux_locataires = (nb_locataires / nb_residences_principales * 100) if nb_residences_principales > 0 else 0
-        taux_hlm = (nb_hlm / nb_residences_principales * 100) if nb_residences_principales > 0 else 0
-        pieces_moyennes = (nb_pieces_total / nb_residences_principales) if nb_residences_principales > 0 else 0
+        def _rounded(key):
+            return round(row[key], 1) if row[key] else 0
         
         return {
             'commune': row.get('Libellé commune ou ARM', ville_nom),
             'code_commune': row.get('code_commune', 'N/A'),
             'departement': departement_code,
             'annee': 2022,
-            'nombre_logements': int(nb_logements) if pd.notna(nb_logements) else 'N/A',
-            'nombre_residences_principales': int(nb_residences_principales) if pd.notna(nb_residences_principales) else 'N/A',
-            'nombre_residences_secondaires': int(nb_secondaires) if pd.notna(nb_secondaires) else 'N/A',
-            'nombre_logements_vacants': int(nb_vacants) if pd.notna(nb_vacants) else 'N/A',
-            'nombre_maisons': int(nb_maisons) if pd.notna(nb_maisons) else 'N/A',
-            'nombre_appartements': int(nb_appartements) if pd.notna(nb_appartements) else 'N/A',
-            'nombre_menages': int(nb_menages) if pd.notna(nb_menages) else 'N/A',
-            'taux_logements_vacants': round(taux_vacants, 1) if taux_vacants else 0,
-            'taux_residence_secondaire': round(taux_secondaires, 1) if taux_secondaires else 0,
-            'taux_maisons': round(taux_maisons, 1) if taux_maisons else 0,
-            'taux_appartements': round(taux_appartements, 1) if taux_appartements else 0,
-            'taux_proprietaires': round(taux_proprietaires, 1) if taux_proprietaires else 0,
-            'taux_locataires': round(taux_locataires, 1) if taux_locataires else 0,
-            'taux_hlm': round(taux_hlm, 1) if taux_hlm else 0,
-            'pieces_moyennes': round(pieces_moyennes, 1) if pieces_moyennes else 0,
-            'nb_proprietaires': int(nb_proprietaires) if pd.notna(nb_proprietaires) else 'N/A',
-            'nb_locataires': int(nb_locataires) if pd.notna(nb_locataires) else 'N/A',
-            'nb_hlm': int(nb_hlm) if pd.notna(nb_hlm) else 'N/A'
+            'nombre_logements': _count('nombre_logements'),
+            'nombre_residences_principales': _count('nombre_residences_principales'),
+            'nombre_residences_secondaires': _count('nombre_residences_secondaires'),
+            'nombre_logements_vacants': _count('nombre_logements_vacants'),
+            'nombre_maisons': _count('nombre_maisons'),
+            'nombre_appartements': _count('nombre_appartements'),
+            'nombre_menages': _count('nombre_menages'),
+            'taux_logements_vacants': _rounded('taux_logements_vacants'),
+            'taux_residence_secondaire': _rounded('taux_residence_secondaire'),
+            'taux_maisons': _rounded('taux_maisons'),
+            'taux_appartements': _rounded('taux_appartements'),
+            'taux_proprietaires': _rounded('taux_proprietaires'),
+            'taux_locataires': _rounded('taux_locataires'),
+            'taux_hlm': _rounded('taux_hlm'),
+            'pieces_moyennes': _rounded('pieces_moyennes'),
+            'nb_proprietaires': _count('nb_proprietaires'),
+            'nb_locataires': _count('nb_locataires'),
+            'nb_hlm': _count('nb_hlm')
         }
     except Exception as e:
         st.warning(f"Erreur lors de la récupération des données de logement pour {ville_nom}: {e}")
@@ -824,137 +1848,31 @@ def get_formation_data(city: str, ville_nom: str, departement_code: str) -> Opti
     Couvre la population active 15-64 ans par niveau de diplôme et catégorie socio-pro.
     """
     try:
-        df_emploi = load_communes_emploi_data()
-        if df_emploi.empty:
-            return None
-
-        df_cities = load_cities_data()
-        if df_cities.empty:
-            return None
-
-        city_info = df_cities[df_cities['ville'] == city]
-        if city_info.empty:
-            return None
-
-        # Recherche des données de la commune (même logique que get_employment_data)
-        if ville_nom in ['Paris', 'Marseille', 'Lyon']:
-            commune_data = df_emploi[
-                (df_emploi['Département'] == departement_code) &
-                (df_emploi['Libellé géographique'].str.contains(
-                    f'^{ville_nom}', case=False, regex=True, na=False
-                ))
-            ]
-        else:
-            commune_data = df_emploi[
-                df_emploi['Libellé géographique'].str.lower() == ville_nom.lower()
-            ]
-            if commune_data.empty:
-                communes_dept = df_emploi[df_emploi['Département'] == departement_code]
-                if not communes_dept.empty:
-                    for idx, row in communes_dept.iterrows():
-                        if ville_nom.lower() in str(row['Libellé géographique']).lower():
-                            commune_data = communes_dept[communes_dept.index == idx]
-                            break
-
-        if commune_data.empty:
+        # Ligne d'indicateurs résolue une seule fois par ville (agrégée pour les arrondissements)
+        row = _resolve_commune('emploi', city)
+        if row is None:
             return None
 
-        # Agréger si plusieurs lignes (arrondissements)
-        if len(commune_data) > 1:
-            dipl_pcs_cols = [
-                'Actifs Sans diplôme ou CEP en 2022 (princ)',
-                'Actifs BEPC, brevet des collèges, DNB en 2022 (princ)',
-                'Actifs CAP-BEP ou équiv. en 2022 (princ)',
-                'Actifs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-                'Actifs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-                'Actifs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-                'Actifs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-                'Chômeurs Sans diplôme ou CEP en 2022 (princ)',
-                'Chômeurs BEPC, brevet des collèges, DNB en 2022 (princ)',
-                'Chômeurs CAP-BEP ou équiv. en 2022 (princ)',
-                'Chômeurs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-                'Chômeurs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-                'Chômeurs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-                'Chômeurs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-                'Actifs 15-64 ans Agriculteurs exploitants en 2022 (compl)',
-                'Actifs 15-64 ans Artisans, Comm., Chefs entr. en 2022 (compl)',
-                'Actifs 15-64 ans Cadres, Prof. intel. sup. en 2022 (compl)',
-                'Actifs 15-64 ans Prof. intermédiaires en 2022 (compl)',
-                'Actifs 15-64 ans Employés en 2022 (compl)',
-                'Actifs 15-64 ans Ouvriers en 2022 (compl)',
-                'Actifs 15-64 ans en 2022 (princ)',
-                'Chômeurs 15-64 ans en 2022 (princ)',
-            ]
-            aggregated = {}
-            for col in dipl_pcs_cols:
-                if col in commune_data.columns:
-                    aggregated[col] = commune_data[col].sum()
-            aggregated['Libellé géographique'] = ville_nom
-            aggregated['Département'] = departement_code
-            row = pd.Series(aggregated)
-        else:
-            row = commune_data.iloc[0]
-
         def _safe_int(val):
             return int(val) if pd.notna(val) and val != 0 else 0
 
         # Diplômes des actifs (7 niveaux)
-        dipl_labels = [
-            'Sans diplôme / CEP',
-            'BEPC / Brevet',
-            'CAP-BEP',
-            'Bac / Brevet pro.',
-            'Bac+2',
-            'Bac+3/4',
-            'Bac+5 et plus',
-        ]
-        actifs_dipl_cols = [
-            'Actifs Sans diplôme ou CEP en 2022 (princ)',
-            'Actifs BEPC, brevet des collèges, DNB en 2022 (princ)',
-            'Actifs CAP-BEP ou équiv. en 2022 (princ)',
-            'Actifs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-            'Actifs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-        ]
-        chomeurs_dipl_cols = [
-            'Chômeurs Sans diplôme ou CEP en 2022 (princ)',
-            'Chômeurs BEPC, brevet des collèges, DNB en 2022 (princ)',
-            'Chômeurs CAP-BEP ou équiv. en 2022 (princ)',
-            'Chômeurs Bac, brevet pro. ou équiv.  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 2  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 3 ou 4  en 2022 (princ)',
-            'Chômeurs Enseignement sup de niveau bac + 5 ou plus  en 2022 (princ)',
-        ]
-
-        actifs_by_dipl = [_safe_int(row.get(c, 0)) for c in actifs_dipl_cols]
-        chomeurs_by_dipl = [_safe_int(row.get(c, 0)) for c in chomeurs_dipl_cols]
+        actifs_by_dipl = [_safe_int(row.get(c, 0)) for c in ACTIFS_DIPLOME_COLUMNS]
+        chomeurs_by_dipl = [_safe_int(row.get(c, 0)) for c in CHOMEURS_DIPLOME_COLUMNS]
 
-        # Taux de chômage par niveau de diplôme
-        taux_chomage_by_dipl = []
-        for a, ch in zip(actifs_by_dipl, chomeurs_by_dipl):
-            taux_chomage_by_dipl.append(round(ch / a * 100, 1) if a > 0 else 0)
+        # Taux de chômage par niveau de diplôme (précalculés dans la table d'indicateurs)
+        taux_chomage_by_dipl = [
+            round(float(row[f'taux_chomage_dipl_{i}']), 1) if a > 0 else 0
+            for i, a in enumerate(actifs_by_dipl)
+        ]
 
         # PCS
-        pcs_labels = [
-            'Agriculteurs',
-            'Artisans / Comm.',
-            'Cadres',
-            'Prof. intermédiaires',
-            'Employés',
-            'Ouvriers',
-        ]
-        pcs_cols = [
-            'Actifs 15-64 ans Agriculteurs exploitants en 2022 (compl)',
-            'Actifs 15-64 ans Artisans, Comm., Chefs entr. en 2022 (compl)',
-            'Actifs 15-64 ans Cadres, Prof. intel. sup. en 2022 (compl)',
-            'Actifs 15-64 ans Prof. intermédiaires en 2022 (compl)',
-            'Actifs 15-64 ans Employés en 2022 (compl)',
-            'Actifs 15-64 ans Ouvriers en 2022 (compl)',
-        ]
-        pcs_values = [_safe_int(row.get(c, 0)) for c in pcs_cols]
+        pcs_values = [_safe_int(row.get(c, 0)) for c in PCS_COLUMNS]
         total_pcs = sum(pcs_values)
-        pcs_pct = [round(v / total_pcs * 100, 1) if total_pcs > 0 else 0 for v in pcs_values]
+        pcs_pct = [
+            round(float(row[f'pcs_pct_{i}']), 1) if total_pcs > 0 else 0
+            for i in range(len(pcs_values))
+        ]
 
         total_actifs = _safe_int(row.get('Actifs 15-64 ans en 2022 (princ)', 0))
         total_actifs_dipl = sum(actifs_by_dipl)
@@ -964,20 +1882,20 @@ def get_formation_data(city: str, ville_nom: str, departement_code: str) -> Opti
             'departement': departement_code,
             'annee': 2022,
             'total_actifs': total_actifs,
-            'dipl_labels': dipl_labels,
+            'dipl_labels': list(DIPLOME_LABELS),
             'actifs_by_dipl': actifs_by_dipl,
             'chomeurs_by_dipl': chomeurs_by_dipl,
             'taux_chomage_by_dipl': taux_chomage_by_dipl,
-            'pcs_labels': pcs_labels,
+            'pcs_labels': list(PCS_LABELS),
             'pcs_values': pcs_values,
             'pcs_pct': pcs_pct,
             # Taux de diplômés du supérieur (bac+2 et plus) parmi les actifs
             'part_superieur': round(
-                sum(actifs_by_dipl[4:]) / total_actifs_dipl * 100, 1
+                float(row['part_superieur']), 1
             ) if total_actifs_dipl > 0 else 0,
             # Part des actifs sans diplôme
             'part_sans_diplome': round(
-                actifs_by_dipl[0] / total_actifs_dipl * 100, 1
+                float(row['part_sans_diplome']), 1
             ) if total_actifs_dipl > 0 else 0,
         }
     except Exception as e:
@@ -985,6 +1903,124 @@ def get_formation_data(city: str, ville_nom: str, departement_code: str) -> Opti
         return None
 
 
+def _batch_counts(rows: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Effectifs tronqués à l'entier comme dans les get_* (manquants : <NA>)
+    """
+    return np.trunc(_count_column(rows, column)).astype('Int64')
+
+
+def get_employment_data_many(cities: List[str]) -> pd.DataFrame:
+    """
+    Indicateurs d'emploi de plusieurs villes en une seule jointure vectorisée.
+    Une ligne par ville trouvée (index : ville), mêmes colonnes et mêmes valeurs
+    que get_employment_data ; 'N/A' y est représenté par <NA>.
+    """
+    try:
+        rows = _resolve_communes_many('emploi', cities)
+        if rows.empty:
+            return pd.DataFrame()
+
+        result = pd.DataFrame({
+            'commune': rows['Libellé géographique'],
+            'code_commune': rows['Code géographique'],
+            'departement': rows['departement_code'],
+            'annee': 2022,
+        }, index=rows.index)
+        for key, col in EMPLOI_COUNT_COLUMNS.items():
+            result[key] = _batch_counts(rows, col)
+        for key in ['taux_activite', 'taux_chomage', 'taux_emploi', 'part_inactifs']:
+            result[key] = rows[key].round(1)
+        return result
+    except Exception as e:
+        st.warning(f"Erreur lors de la récupération des données d'emploi: {e}")
+        return pd.DataFrame()
+
+
+def get_housing_data_many(cities: List[str]) -> pd.DataFrame:
+    """
+    Indicateurs de logement de plusieurs villes en une seule jointure vectorisée.
+    Une ligne par ville trouvée (index : ville), mêmes colonnes et mêmes valeurs
+    que get_housing_data ; 'N/A' y est représenté par <NA>.
+    """
+    try:
+        rows = _resolve_communes_many('logement', cities)
+        if rows.empty:
+            return pd.DataFrame()
+
+        result = pd.DataFrame({
+            'commune': rows['Libellé commune ou ARM'],
+            'code_commune': rows['code_commune'],
+            'departement': rows['departement_code'],
+            'annee': 2022,
+        }, index=rows.index)
+        for key, col in LOGEMENT_COUNT_COLUMNS.items():
+            result[key] = _batch_counts(rows, col)
+        for key in [
+            'taux_logements_vacants', 'taux_residence_secondaire', 'taux_maisons',
+            'taux_appartements', 'taux_proprietaires', 'taux_locataires', 'taux_hlm',
+            'pieces_moyennes'
+        ]:
+            result[key] = rows[key].round(1)
+        return result
+    except Exception as e:
+        st.warning(f"Erreur lors de la récupération des données de logement: {e}")
+        return pd.DataFrame()
+
+
+def get_formation_data_many(cities: List[str]) -> pd.DataFrame:
+    """
+    Indicateurs de formation de plusieurs villes en une seule jointure vectorisée.
+    Une ligne par ville trouvée (index : ville) ; les listes de get_formation_data
+    deviennent des colonnes '<clé>:<libellé>' (ex. 'taux_chomage_by_dipl:Bac+2').
+    """
+    try:
+        rows = _resolve_communes_many('emploi', cities)
+        if rows.empty:
+            return pd.DataFrame()
+
+        def _rounded(series: pd.Series) -> pd.Series:
+            # Arrondi Python sur des flottants, comme get_formation_data
+            return series.map(lambda value: round(float(value), 1))
+
+        result = pd.DataFrame({
+            'commune': rows['Libellé géographique'],
+            'departement': rows['departement_code'],
+            'annee': 2022,
+            'total_actifs': np.trunc(_count_column(rows, EMPLOI_COUNT_COLUMNS['actifs']).fillna(0)).astype(int),
+        }, index=rows.index)
+        for i, label in enumerate(DIPLOME_LABELS):
+            result[f'actifs_by_dipl:{label}'] = np.trunc(_count_column(rows, ACTIFS_DIPLOME_COLUMNS[i]).fillna(0)).astype(int)
+            result[f'chomeurs_by_dipl:{label}'] = np.trunc(_count_column(rows, CHOMEURS_DIPLOME_COLUMNS[i]).fillna(0)).astype(int)
+            result[f'taux_chomage_by_dipl:{label}'] = _rounded(rows[f'taux_chomage_dipl_{i}'])
+        for i, label in enumerate(PCS_LABELS):
+            result[f'pcs_values:{label}'] = np.trunc(_count_column(rows, PCS_COLUMNS[i]).fillna(0)).astype(int)
+            result[f'pcs_pct:{label}'] = _rounded(rows[f'pcs_pct_{i}'])
+        result['part_superieur'] = _rounded(rows['part_superieur'])
+        result['part_sans_diplome'] = _rounded(rows['part_sans_diplome'])
+        return result
+    except Exception as e:
+        st.warning(f"Erreur lors de la récupération des données de formation: {e}")
+        return pd.DataFrame()
+
+
+def get_commune_match_report() -> pd.DataFrame:
+    """
+    Liste les villes du catalogue dont le libellé INSEE n'a pas été trouvé à l'identique :
+    commune retenue par la recherche approchée (code, libellé, score, candidats)
+    ou aucune correspondance (code_commune vide), pour chaque jeu de données
+    """
+    df_cities = load_cities_data()
+    if df_cities.empty:
+        return pd.DataFrame()
+    rows = []
+    for dataset in _INSEE_DATASETS:
+        insee = _get_insee_dataset(dataset, df_cities.attrs.get('catalogue_version'))
+        if insee is not None:
+            rows.extend({'jeu': dataset, **entry} for entry in insee['match_report'])
+    return pd.DataFrame(rows)
+
+
 def get_city_list(df: pd.DataFrame) -> List[str]:
     """
     Retourne la liste des noms de villes triée
@@ -998,8 +2034,12 @@ def get_city_info(df: pd.DataFrame, city_name: str) -> Optional[pd.Series]:
     """
     Retourne les informations d'une ville spécifique
     """
-    if 'ville' in df.columns:
-        city_data = df[df['ville'] == city_name]
-        if not city_data.empty:
-            return city_data.iloc[0]
-    return None
+    city_entry = _lookup_city(df, city_name)
+    if city_entry is None:
+        return None
+    # L'index peut provenir d'un autre DataFrame de même version : vérifier la position.
+    position = city_entry['position']
+    if position < len(df) and df['ville'].iat[position] == city_name:
+        return df.iloc[position]
+    city_data = df[df['ville'] == city_name]
+    return city_data.iloc[0] if not city_data.empty else None
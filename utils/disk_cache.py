@@ -0,0 +1,142 @@
+"""
+Cache disque partagé entre les processus de l'application.
+Stocke des instantanés de DataFrames (Parquet, ou Feather mappé en mémoire)
+accompagnés de métadonnées JSON.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+# Dossier des instantanés locaux (non versionné)
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+
+
+def _atomic_write(path: Path, write: Callable[[str], None]) -> None:
+    """
+    Écrit un fichier via un fichier temporaire puis un renommage atomique,
+    pour qu'un lecteur concurrent ne voie jamais un fichier partiel.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_json(name: str) -> Optional[Dict]:
+    """
+    Lit un fichier de métadonnées JSON du cache, ou None s'il est absent ou illisible
+    """
+    path = CACHE_DIR / f"{name}.json"
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(name: str, payload: Dict) -> None:
+    """
+    Écrit un fichier de métadonnées JSON dans le cache
+    """
+    def _write(tmp_path: str) -> None:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    _atomic_write(CACHE_DIR / f"{name}.json", _write)
+
+
+def read_snapshot(name: str) -> Tuple[Optional[pd.DataFrame], Dict]:
+    """
+    Lit un instantané Parquet et ses métadonnées.
+    Retourne (None, {}) si l'instantané n'existe pas ou est corrompu.
+    """
+    meta = read_json(name)
+    path = CACHE_DIR / f"{name}.parquet"
+    if meta is None or not path.exists():
+        return None, {}
+    try:
+        return pd.read_parquet(path), meta
+    except Exception:
+        return None, {}
+
+
+def write_snapshot(name: str, df: pd.DataFrame, meta: Dict) -> None:
+    """
+    Écrit un instantané Parquet puis ses métadonnées
+    """
+    _atomic_write(CACHE_DIR / f"{name}.parquet", lambda tmp_path: df.to_parquet(tmp_path, index=False))
+    write_json(name, meta)
+
+
+def file_signature(path: Path) -> Dict:
+    """
+    Taille et date de modification d'un fichier source, pour ne recalculer
+    son empreinte que lorsqu'elles changent
+    """
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_digest(path: Path) -> str:
+    """
+    Calcule l'empreinte SHA-1 d'un fichier source, lu par blocs
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """
+    Calcule l'empreinte SHA-1 du contenu d'un DataFrame (valeurs et noms de colonnes)
+    """
+    digest = hashlib.sha1("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def read_feather(name: str) -> Tuple[Optional[pd.DataFrame], Dict]:
+    """
+    Lit une table Feather (Arrow IPC) en la mappant en mémoire : les pages du fichier
+    sont partagées entre processus via le cache du système d'exploitation.
+    Les colonnes numériques sans valeur manquante restent des vues en lecture seule
+    sur le fichier (sans copie) ; les autres sont converties en colonnes pandas.
+    Le DataFrame doit donc être servi tel quel (st.cache_resource), sans copie par session.
+    Retourne (None, {}) si la table n'existe pas ou est illisible.
+    """
+    meta = read_json(name)
+    path = CACHE_DIR / f"{name}.feather"
+    if meta is None or not path.exists():
+        return None, {}
+    try:
+        from pyarrow import feather
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True), meta
+    except Exception:
+        return None, {}
+
+
+def write_feather(name: str, df: pd.DataFrame, meta: Dict) -> None:
+    """
+    Écrit une table Feather non compressée (condition du mappage mémoire) puis ses métadonnées
+    """
+    from pyarrow import feather
+
+    _atomic_write(
+        CACHE_DIR / f"{name}.feather",
+        lambda tmp_path: feather.write_feather(df, tmp_path, compression="uncompressed")
+    )
+    write_json(name, meta)
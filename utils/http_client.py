@@ -0,0 +1,184 @@
+"""
+Client HTTP partagé pour les appels aux services externes (OpenDataSoft, Open-Meteo).
+Une session par hôte (connexions gardées ouvertes et réutilisées), quelques nouvelles
+tentatives espacées aléatoirement pour les erreurs passagères, et un disjoncteur par hôte :
+tant qu'un service est en panne, les appels échouent immédiatement au lieu d'attendre le délai.
+Les réponses peuvent être enregistrées pour être rejouées hors ligne (tools/replay_server.py).
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Connexions gardées par hôte (au moins le nombre d'appels simultanés vers un même service)
+HTTP_POOL_SIZE = 16
+# Nouvelles tentatives après un échec passager, et attente maximale entre deux tentatives (en secondes)
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 4
+# Codes de réponse considérés comme passagers
+HTTP_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Disjoncteur : échecs consécutifs avant ouverture, et durée d'ouverture avant un nouvel essai (en secondes)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+# Dossier où enregistrer les réponses reçues, pour le rejeu hors ligne (désactivé si absent)
+HTTP_RECORD_DIR = os.environ.get("METAPOLIS_HTTP_RECORD_DIR")
+# En-têtes conservés dans un enregistrement
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Appel refusé sans contacter l'hôte : son disjoncteur est ouvert."""
+
+
+class _CircuitBreaker:
+    """
+    Disjoncteur d'un hôte : fermé, ouvert après plusieurs échecs consécutifs,
+    puis un seul appel d'essai autorisé une fois le délai écoulé (semi-ouvert) ;
+    l'échec de cet appel rouvre immédiatement le disjoncteur
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Autorise l'appel ou lève CircuitOpenError ; retourne True s'il s'agit de l'appel d'essai
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < BREAKER_RESET_SECONDS or self.trial_in_flight:
+                raise CircuitOpenError(f"{self.host} indisponible (disjoncteur ouvert)")
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Disjoncteur refermé pour %s", self.host)
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                if self.opened_at is None:
+                    logger.warning("Disjoncteur ouvert pour %s après %d échecs", self.host, self.failures)
+                self.opened_at = time.monotonic()
+
+
+_sessions: Dict[str, requests.Session] = {}
+_breakers: Dict[str, _CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def _host_state(host: str):
+    with _registry_lock:
+        if host not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+            _breakers[host] = _CircuitBreaker(host)
+        return _sessions[host], _breakers[host]
+
+
+def _backoff_delay(attempt: int, response: Optional[requests.Response]) -> float:
+    """
+    Attente avant la tentative suivante : Retry-After si le service l'indique,
+    sinon attente exponentielle tirée aléatoirement (« full jitter »)
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def recording_key(path: str, query: str, ignored_params: Iterable[str] = ()) -> str:
+    """
+    Clé d'un enregistrement : chemin et paramètres de la requête, dans un ordre indifférent
+    """
+    ignored = set(ignored_params)
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True) if name not in ignored)
+    return hashlib.sha1(json.dumps([path, params]).encode("utf-8")).hexdigest()
+
+
+def _record(response: requests.Response) -> None:
+    """
+    Enregistre une réponse réussie dans HTTP_RECORD_DIR/<hôte>/<clé>.json
+    """
+    parsed = urlparse(response.url)
+    folder = Path(HTTP_RECORD_DIR) / parsed.netloc.replace(":", "_")
+    folder.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'url': response.url,
+        'status': response.status_code,
+        'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+        'body': response.text
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, folder / f"{recording_key(parsed.path, parsed.query)}.json")
+
+
+def get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None, timeout: float = 10) -> requests.Response:
+    """
+    Requête GET via la session de l'hôte, avec nouvelles tentatives et disjoncteur.
+    Retourne la réponse (y compris 304 et erreurs 4xx, à traiter par l'appelant) ;
+    lève une exception requests si l'hôte reste injoignable ou si son disjoncteur est ouvert.
+
+    Les nouvelles tentatives multiplient le délai : au pire (HTTP_MAX_RETRIES + 1) × timeout,
+    plus HTTP_MAX_RETRIES × HTTP_BACKOFF_MAX d'attente, soit 3 × 10 + 2 × 4 = 38 s avec le délai
+    par défaut (timeout borne la connexion et chaque attente de données, pas la durée totale).
+    L'appel d'essai d'un disjoncteur semi-ouvert est une tentative unique (au pire timeout).
+    """
+    host = urlparse(url).netloc
+    session, breaker = _host_state(host)
+    max_retries = 0 if breaker.before_call() else HTTP_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        response = None
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                breaker.record_failure()
+                raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code not in HTTP_RETRY_STATUSES:
+                breaker.record_success()
+                if HTTP_RECORD_DIR and 200 <= response.status_code < 300:
+                    try:
+                        _record(response)
+                    except OSError as e:
+                        logger.warning("Enregistrement de la réponse impossible (%s) : %s", url, e)
+                return response
+            if attempt == max_retries:
+                breaker.record_failure()
+                return response
+        time.sleep(_backoff_delay(attempt, response))
@@ -0,0 +1,141 @@
+"""
+Cache mémoire « stale-while-revalidate » partagé par les sessions du processus.
+Une entrée demandée récemment est actualisée en arrière-plan avant son expiration ;
+pendant l'actualisation, la dernière valeur reste servie (marquée périmée si elle a expiré).
+Seule la toute première demande d'une clé attend la source.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshingCache:
+    """
+    Cache clé -> valeur alimenté par fetch(clé), qui lève une exception en cas d'échec
+    (la dernière valeur connue est alors conservée)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[Hashable], Any],
+        ttl: float,
+        refresh_ahead: float,
+        keep_for: float,
+        max_entries: int,
+        workers: int = 4,
+        poll_interval: float = 60
+    ):
+        self.name = name
+        self._fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.keep_for = keep_for
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        # clé -> {'value', 'fetched_at', 'requested_at'}
+        self._entries: Dict[Hashable, Dict] = {}
+        self._in_flight = set()
+        self._fetch_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-refresh")
+        self._poller: Optional[threading.Thread] = None
+
+    def get(self, key: Hashable) -> Tuple[Any, bool, float]:
+        """
+        Retourne (valeur, périmée, horodatage de la récupération).
+        Sans valeur connue, la récupération est faite immédiatement (l'exception est propagée).
+        """
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        # Une seule récupération initiale par clé : les demandes simultanées attendent son résultat.
+        with self._lock:
+            key_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            try:
+                value = self._fetch(key)
+                fetched_at = time.time()
+                self._store(key, value, fetched_at)
+            finally:
+                with self._lock:
+                    self._fetch_locks.pop(key, None)
+
+        self._ensure_poller()
+        return value, False, fetched_at
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, bool, float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['requested_at'] = now
+            age = now - entry['fetched_at']
+            if age >= self.ttl - self.refresh_ahead:
+                self._schedule_locked(key)
+            return entry['value'], age >= self.ttl, entry['fetched_at']
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: Hashable, value: Any, fetched_at: float) -> None:
+        with self._lock:
+            entry = self._entries.setdefault(key, {'requested_at': fetched_at})
+            entry.update(value=value, fetched_at=fetched_at)
+            # Au-delà de la taille maximale, oublier les clés demandées le moins récemment.
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]['requested_at'])
+                for stale_key in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[stale_key]
+
+    def _schedule_locked(self, key: Hashable) -> None:
+        if key in self._in_flight:
+            return
+        self._in_flight.add(key)
+        self._executor.submit(self._refresh, key)
+
+    def _refresh(self, key: Hashable) -> None:
+        try:
+            value = self._fetch(key)
+            with self._lock:
+                # Clé oubliée pendant l'actualisation : ne pas la recréer.
+                if key not in self._entries:
+                    return
+            self._store(key, value, time.time())
+        except Exception as e:
+            logger.warning("Actualisation de %s impossible pour %s : %s", self.name, key, e)
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _ensure_poller(self) -> None:
+        with self._lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(target=self._poll, name=f"{self.name}-poller", daemon=True)
+            self._poller.start()
+
+    def _poll(self) -> None:
+        """
+        Actualise avant expiration les clés demandées récemment et oublie les autres
+        """
+        while True:
+            time.sleep(self.poll_interval)
+            now = time.time()
+            with self._lock:
+                for key in list(self._entries):
+                    entry = self._entries[key]
+                    if now - entry['requested_at'] > self.keep_for:
+                        del self._entries[key]
+                    elif now - entry['fetched_at'] >= self.ttl - self.refresh_ahead:
+                        self._schedule_locked(key)
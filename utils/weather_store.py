@@ -0,0 +1,200 @@
+"""
+Historique local de la météo journalière par ville (SQLite, dans le dossier du cache).
+Table en ajout seul (températures max/min, précipitations) indexée par (ville, date)
+pour les requêtes par période, et agrégat cumulé des températures de l'année en cours,
+pour ne demander à l'archive Open-Meteo que les jours manquants.
+"""
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils import disk_cache
+
+# Fichier de la base, dans le dossier des instantanés locaux
+STORE_FILE = "weather.sqlite3"
+# Version du schéma (PRAGMA user_version) : une base d'une autre version est recréée
+STORE_SCHEMA_VERSION = 2
+# Attente maximale (en secondes) d'un verrou posé par un autre processus
+STORE_LOCK_TIMEOUT = 30
+# Délai de publication de l'archive : au-delà, un jour incomplet ne sera plus complété
+ARCHIVE_FINAL_AFTER_DAYS = 7
+
+# Jour d'archive : (date, température max, température min, précipitations)
+DailyWeather = Tuple[date, Optional[float], Optional[float], Optional[float]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_weather (
+    ville TEXT NOT NULL,
+    date TEXT NOT NULL,
+    tmax REAL,
+    tmin REAL,
+    precipitation REAL,
+    PRIMARY KEY (ville, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS temperature_sync (
+    ville TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    synced_through TEXT NOT NULL,
+    checked_on TEXT,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+_LEGACY_TABLES = ("daily_temperature", "daily_weather", "temperature_sync")
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    Ouvre la base (créée au besoin) ; une connexion par appel, utilisable depuis n'importe quel thread
+    """
+    disk_cache.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(disk_cache.CACHE_DIR / STORE_FILE, timeout=STORE_LOCK_TIMEOUT)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != STORE_SCHEMA_VERSION:
+        # Base d'un ancien schéma : c'est un cache, les jours seront redemandés à l'archive.
+        connection.executescript(
+            "".join(f"DROP TABLE IF EXISTS {table};" for table in _LEGACY_TABLES)
+            + _SCHEMA
+            + f"PRAGMA user_version = {STORE_SCHEMA_VERSION};"
+        )
+    return connection
+
+
+def _is_final(day: date, tmax: Optional[float], tmin: Optional[float], checked_on: date) -> bool:
+    """
+    Un jour est définitif s'il est complet, ou plus ancien que le délai de publication de l'archive
+    """
+    return (tmax is not None and tmin is not None) or day <= checked_on - timedelta(days=ARCHIVE_FINAL_AFTER_DAYS)
+
+
+def _read_sync(connection: sqlite3.Connection, ville: str, year: int) -> Dict:
+    row = connection.execute(
+        "SELECT year, synced_through, checked_on, total, count FROM temperature_sync WHERE ville = ?",
+        (ville,)
+    ).fetchone()
+
+    if row is None or row[0] != year:
+        return {
+            'synced_through': date(year, 1, 1) - timedelta(days=1),
+            'checked_on': None,
+            'total': 0.0,
+            'count': 0
+        }
+    return {
+        'synced_through': date.fromisoformat(row[1]),
+        'checked_on': date.fromisoformat(row[2]) if row[2] else None,
+        'total': row[3],
+        'count': row[4]
+    }
+
+
+def _advance_sync(connection: sqlite3.Connection, ville: str, year: int, checked_on: date) -> None:
+    """
+    Avance la synchronisation sur les jours définitifs consécutifs déjà enregistrés
+    et les ajoute à l'agrégat cumulé ; les jours suivant le premier jour non définitif
+    restent provisoires et seront redemandés
+    """
+    sync = _read_sync(connection, ville, year)
+    synced_through, total, count = sync['synced_through'], sync['total'], sync['count']
+
+    rows = connection.execute(
+        "SELECT date, tmax, tmin FROM daily_weather WHERE ville = ? AND date > ? AND date <= ? ORDER BY date",
+        (ville, synced_through.isoformat(), min(checked_on, date(year, 12, 31)).isoformat())
+    ).fetchall()
+    for day_text, tmax, tmin in rows:
+        day = date.fromisoformat(day_text)
+        if day != synced_through + timedelta(days=1) or not _is_final(day, tmax, tmin, checked_on):
+            break
+        synced_through = day
+        values = [t for t in (tmax, tmin) if t is not None]
+        total += sum(values)
+        count += len(values)
+
+    connection.execute(
+        "INSERT OR REPLACE INTO temperature_sync (ville, year, synced_through, checked_on, total, count) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (ville, year, synced_through.isoformat(), checked_on.isoformat(), total, count)
+    )
+
+
+def _insert_days(connection: sqlite3.Connection, ville: str, days: List[DailyWeather]) -> None:
+    connection.executemany(
+        "INSERT OR REPLACE INTO daily_weather (ville, date, tmax, tmin, precipitation) VALUES (?, ?, ?, ?, ?)",
+        [(ville, day.isoformat(), tmax, tmin, precipitation) for day, tmax, tmin, precipitation in days]
+    )
+
+
+def get_temperature_sync(ville: str, year: int) -> Dict:
+    """
+    Retourne l'état de synchronisation d'une ville pour l'année :
+    dernier jour définitif (synced_through), date du dernier appel (checked_on),
+    somme et nombre des températures définitives
+    """
+    with closing(_connect()) as connection:
+        return _read_sync(connection, ville, year)
+
+
+def record_daily_weather(ville: str, days: List[DailyWeather], checked_on: date) -> None:
+    """
+    Enregistre des jours reçus de l'archive (un jour déjà présent est remplacé par sa dernière version)
+    puis avance la synchronisation de l'année de checked_on
+    """
+    with closing(_connect()) as connection, connection:
+        # Lecture et écriture dans la même transaction : deux processus ne cumulent pas deux fois un jour.
+        connection.execute("BEGIN IMMEDIATE")
+        _insert_days(connection, ville, days)
+        _advance_sync(connection, ville, checked_on.year, checked_on)
+
+
+def missing_dates(ville: str, start: date, end: date, checked_on: date) -> List[date]:
+    """
+    Jours de la période absents de l'historique, ou encore provisoires
+    """
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            "SELECT date, tmax, tmin FROM daily_weather WHERE ville = ? AND date BETWEEN ? AND ?",
+            (ville, start.isoformat(), end.isoformat())
+        ).fetchall()
+
+    final = {
+        date.fromisoformat(day_text) for day_text, tmax, tmin in rows
+        if _is_final(date.fromisoformat(day_text), tmax, tmin, checked_on)
+    }
+    period = (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    return [day for day in period if day not in final]
+
+
+def query_daily_weather(ville: str, start: date, end: date) -> pd.DataFrame:
+    """
+    Historique journalier d'une ville sur une période (parcours de la clé primaire (ville, date))
+    """
+    with closing(_connect()) as connection:
+        df = pd.read_sql_query(
+            "SELECT date, tmax, tmin, precipitation FROM daily_weather "
+            "WHERE ville = ? AND date BETWEEN ? AND ? ORDER BY date",
+            connection,
+            params=(ville, start.isoformat(), end.isoformat())
+        )
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def year_to_date_mean(ville: str, year: int, until: date) -> Optional[float]:
+    """
+    Moyenne des températures max et min du 1er janvier à until :
+    agrégat cumulé des jours définitifs, plus les jours provisoires enregistrés depuis
+    """
+    with closing(_connect()) as connection:
+        sync = _read_sync(connection, ville, year)
+        provisional_total, provisional_count = connection.execute(
+            "SELECT COALESCE(SUM(tmax), 0) + COALESCE(SUM(tmin), 0), COUNT(tmax) + COUNT(tmin) "
+            "FROM daily_weather WHERE ville = ? AND date > ? AND date <= ?",
+            (ville, sync['synced_through'].isoformat(), until.isoformat())
+        ).fetchone()
+
+    count = sync['count'] + provisional_count
+    if count == 0:
+        return None
+    return (sync['total'] + provisional_total) / count